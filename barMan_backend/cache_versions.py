@@ -0,0 +1,65 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+# Generation counters for cached data, kept in the shared cache. A counter
+# that was evicted restarts from the current time rather than from zero, so
+# it can never come back to a value that older cache entries were keyed on.
+
+_tracked = set()
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    version = cache.get(_key(name))
+    if version is None:
+        cache.add(_key(name), time.time_ns(), timeout=None)
+        version = cache.get(_key(name))
+    return version
+
+
+def get_versions(names):
+    found = cache.get_many([_key(name) for name in names])
+    return [found.get(_key(name)) or get_version(name) for name in names]
+
+
+def bump_version(name):
+    try:
+        cache.incr(_key(name))
+    except ValueError:
+        cache.set(_key(name), time.time_ns(), timeout=None)
+
+
+def bump_on_commit(name):
+    # Bumping before commit would let a reader cache pre-commit data under
+    # the new version
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def version_name(model):
+    return model._meta.label_lower
+
+
+def bump_model(model):
+    # For writes that bypass model signals (queryset.update, bulk_update)
+    bump_on_commit(version_name(model))
+
+
+def _bump_sender(sender, **kwargs):
+    bump_on_commit(version_name(sender))
+
+
+def track_changes(model):
+    """Bump model's counter on every save and delete; call from AppConfig.ready."""
+    name = version_name(model)
+    _tracked.add(name)
+    post_save.connect(_bump_sender, sender=model, weak=False, dispatch_uid=f'version-save:{name}')
+    post_delete.connect(_bump_sender, sender=model, weak=False, dispatch_uid=f'version-delete:{name}')
+
+
+def is_tracked(model):
+    return version_name(model) in _tracked
@@ -1,4 +1,6 @@
 import logging
+import random
+from django.conf import settings
 
 class DuplicateFilter(logging.Filter):
     def __init__(self, name=''):
@@ -10,4 +12,21 @@ class DuplicateFilter(logging.Filter):
         if current_log != self.last_log:
             self.last_log = current_log
             return True
-        return False
\ No newline at end of file
+        return False
+
+class DebugSampler:
+    """Decides whether a hot path should emit a debug line.
+
+    False unless the logger is enabled for DEBUG, and then True for only a
+    DEBUG_LOG_SAMPLE_RATE share of calls. Check it before building the message.
+    """
+
+    def __init__(self, logger, rate=None):
+        self.logger = logger
+        self.rate = rate
+
+    def __call__(self):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return False
+        rate = self.rate if self.rate is not None else getattr(settings, 'DEBUG_LOG_SAMPLE_RATE', 0.01)
+        return random.random() < rate
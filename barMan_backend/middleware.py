@@ -1,4 +1,6 @@
 import logging
+import time
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
@@ -14,4 +16,32 @@ class LargeHeadersLoggingMiddleware:
                 if isinstance(value, str) and len(value) > 1000:
                     logger.warning(f"Large header: {key}: {value[:100]}...")
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+class SessionRefreshMiddleware:
+    """Push a session's expiry forward only when it is close to running out.
+
+    Replaces SESSION_SAVE_EVERY_REQUEST, which rewrote every session on every
+    request. A session is saved, with a new expiry and cookie, once less than
+    SESSION_REFRESH_THRESHOLD seconds of it remain. Works with any engine,
+    signed cookies included. Goes after SessionMiddleware.
+    """
+    marker = '_refreshed_at'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        if session is None or settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return response
+        refreshed_at = session.get(self.marker)
+        if session.is_empty() or session.modified or session.get('_session_expiry') is not None:
+            # Unknown or expired cookie, already being saved, or an expiry set on purpose
+            return response
+        now = int(time.time())
+        threshold = getattr(settings, 'SESSION_REFRESH_THRESHOLD', settings.SESSION_COOKIE_AGE // 2)
+        if refreshed_at is None or refreshed_at + settings.SESSION_COOKIE_AGE - now < threshold:
+            session[self.marker] = now
+        return response
@@ -0,0 +1,40 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """TestCase mixin that catches N+1 regressions in list endpoints.
+
+    assertQueryCountFlat requests the same URL at two page sizes and fails if
+    the larger page costs more queries, i.e. if some relation is fetched per
+    row instead of being declared with select_related/prefetch_related.
+    Unpaginated endpoints pass grow, a callable that adds rows between the
+    two requests, in place of the page sizes.
+    """
+    page_size_param = 'page_size'
+
+    def count_queries(self, client, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, params)
+        self.assertLess(response.status_code, 400, getattr(response, 'data', response))
+        return len(context.captured_queries)
+
+    def assertQueryCountFlat(self, client, url, small=1, large=50, budget=None, grow=None, **params):
+        if grow is not None:
+            small_count = self.count_queries(client, url, **params)
+            grow()
+            large_count = self.count_queries(client, url, **params)
+            small, large = 'fewer', 'more'
+        else:
+            small_count = self.count_queries(client, url, **{self.page_size_param: small, **params})
+            large_count = self.count_queries(client, url, **{self.page_size_param: large, **params})
+        self.assertEqual(
+            small_count, large_count,
+            f"{url} made {small_count} queries for {small} rows but {large_count} for {large}"
+        )
+        if budget is not None:
+            self.assertLessEqual(large_count, budget, f"{url} made {large_count} queries, budget is {budget}")
+
+    def assertQueryBudget(self, client, url, budget, **params):
+        count = self.count_queries(client, url, **params)
+        self.assertLessEqual(count, budget, f"{url} made {count} queries, budget is {budget}")
@@ -0,0 +1,210 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Session engine that reads from the cache and writes to the database behind
+# it. Saves land in the cache straight away; the session keys are queued and
+# a daemon worker upserts each batch into django_session in one statement,
+# so a burst of dashboard requests costs one write rather than one each.
+# Creating and deleting a session still go to the database immediately.
+# Every worker has to see the same cache, or a logout in one leaves the
+# session alive in the others; check_shared_cache refuses LocMemCache.
+
+KEY_PREFIX = 'barman.session.'
+
+_pending = queue.Queue()
+# Keys the worker has taken off the queue and not yet written
+_collecting = set()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache():
+    return caches[_setting('SESSION_CACHE_ALIAS', 'default')]
+
+
+def _cache_key(session_key):
+    return KEY_PREFIX + session_key
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.SESSION_ENGINE != __name__ or not isinstance(_cache(), LocMemCache):
+        return []
+    return [checks.Error(
+        f"SESSION_ENGINE '{__name__}' needs a cache shared by every worker, "
+        f"but '{_setting('SESSION_CACHE_ALIAS', 'default')}' is a per-process LocMemCache.",
+        hint="Point SESSION_CACHE_ALIAS at a shared cache such as Redis or Memcached, "
+             "or use 'django.contrib.sessions.backends.db'.",
+        id='barMan_backend.E001',
+    )]
+
+
+class SessionStore(DBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    @property
+    def cache_key(self):
+        return _cache_key(self._get_or_create_session_key())
+
+    def load(self):
+        try:
+            entry = _cache().get(self.cache_key)
+        except Exception:
+            # Cache unavailable; the database copy is at most one batch behind
+            entry = None
+        if entry is not None:
+            session_data, expire_date = entry
+            if expire_date > timezone.now():
+                return self.decode(session_data)
+            self._session_key = None
+            return {}
+        s = self._get_session_from_db()
+        if s is None:
+            return {}
+        self._store(s.session_key, s.session_data, s.expire_date)
+        return self.decode(s.session_data)
+
+    def exists(self, session_key):
+        return _cache_key(session_key) in _cache() or super().exists(session_key)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        # New keys are inserted now so a clash raises CreateError; a session
+        # missing from the cache may have been deleted, and the database
+        # write raises UpdateError for that instead of bringing it back
+        write_behind = (
+            _setting('SESSION_WRITE_BEHIND', True) and not must_create
+            and _cache_key(self.session_key) in _cache()
+        )
+        if not write_behind:
+            super().save(must_create=must_create)
+        data = self._get_session(no_load=must_create)
+        self._store(self.session_key, self.encode(data), self.get_expiry_date())
+        if write_behind:
+            _enqueue(self.session_key)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        # Cache first: a flush that already read this session re-checks the
+        # cache after writing and removes the row again
+        _cache().delete(_cache_key(session_key))
+        super().delete(session_key)
+
+    def _store(self, session_key, session_data, expire_date):
+        timeout = max(int((expire_date - timezone.now()).total_seconds()), 1)
+        _cache().set(_cache_key(session_key), (session_data, expire_date), timeout)
+
+    @classmethod
+    def clear_expired(cls):
+        purge_expired()
+
+
+def purge_expired(batch_size=1000):
+    """Delete expired sessions batch_size rows at a time and return how many went."""
+    Session = SessionStore.get_model_class()
+    now = timezone.now()
+    deleted = 0
+    while True:
+        batch = list(Session.objects.filter(expire_date__lt=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        Session.objects.filter(pk__in=batch).delete()
+        deleted += len(batch)
+    return deleted
+
+
+def flush(session_keys):
+    """Write the cached copies of session_keys to the database in one upsert."""
+    session_keys = set(session_keys)
+    if not session_keys:
+        return 0
+    Session = SessionStore.get_model_class()
+    keys = {_cache_key(key): key for key in session_keys}
+    rows = [
+        Session(session_key=keys[cache_key], session_data=session_data, expire_date=expire_date)
+        for cache_key, (session_data, expire_date) in _cache().get_many(keys).items()
+    ]
+    Session.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['session_key'], update_fields=['session_data', 'expire_date']
+    )
+    # Sessions deleted while this batch was in flight must not come back
+    still_cached = _cache().get_many([_cache_key(row.session_key) for row in rows])
+    gone = [row.session_key for row in rows if _cache_key(row.session_key) not in still_cached]
+    if gone:
+        Session.objects.filter(session_key__in=gone).delete()
+    return len(rows) - len(gone)
+
+
+def _enqueue(session_key):
+    _pending.put(session_key)
+    _ensure_worker()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='session-write-behind', daemon=True)
+            _worker.start()
+
+
+def _next_batch():
+    _collecting.add(_pending.get())
+    deadline = time.monotonic() + _setting('SESSION_WRITE_BEHIND_WINDOW', 5)
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            _collecting.add(_pending.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return set(_collecting)
+
+
+def _run():
+    while True:
+        batch = _next_batch()
+        try:
+            flush(batch)
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} sessions to the database: {str(e)}", exc_info=True)
+        finally:
+            _collecting.difference_update(batch)
+            close_old_connections()
+
+
+@atexit.register
+def _drain():
+    # Write whatever is still queued when the process exits cleanly
+    batch = set(_collecting)
+    while True:
+        try:
+            batch.add(_pending.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        try:
+            flush(batch)
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} sessions at exit: {str(e)}")
@@ -33,6 +33,7 @@ INSTALLED_APPS = [
     'corsheaders',  
     'sales',
     'users',
+    'sync',
     'debug_toolbar',
 ]
 
@@ -40,6 +41,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'barMan_backend.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -77,6 +79,45 @@ DATABASES = {
         'CONN_MAX_AGE': 0,
 }
 }
+
+# Cache used for versioned API caches. The per-process default is fine for a
+# single worker; point this at Redis or Memcached when running several, so
+# invalidations reach every process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'barman-default'),
+    }
+}
+
+# How long an inventory list page stays cached; writes invalidate it sooner
+INVENTORY_CACHE_TIMEOUT = 60 * 15
+
+# Low stock alerts are checked off the request path by a background worker
+LOW_STOCK_ALERTS_ASYNC = True
+LOW_STOCK_ALERT_WINDOW = 2  # seconds to collect a batch
+LOW_STOCK_ALERT_BATCH_SIZE = 200
+LOW_STOCK_ALERT_COOLDOWN = 60 * 15  # seconds before the same item alerts again
+
+INVENTORY_DELETE_GRACE_DAYS = 30  # soft-deleted items are purged after this
+
+STOCK_HOLD_TTL = 120  # seconds a terminal's hold on stock lasts without renewal
+
+# Customer batch endpoint
+BATCH_READ_WORKERS = 4  # independent read operations run on this many threads
+BATCH_READ_MAX_PAGE_SIZE = 1000
+
+# Customer search (?q=)
+CUSTOMER_SEARCH_LIMIT = 20  # results returned when no ?limit is given
+CUSTOMER_SEARCH_MAX_LIMIT = 50
+PHONE_DEFAULT_COUNTRY_CODE = '234'  # replaces the leading 0 of local numbers
+
+# Customer statements (generate_statements command and /api/sales/statements/)
+STATEMENTS_DIR = BASE_DIR / 'statements'
+STATEMENT_WORKERS = None  # processes writing files; None uses every CPU
+STATEMENT_CHUNK_SIZE = 2000  # sales fetched per round trip
+STATEMENT_BATCH_SIZE = 250  # customers handed to a worker at a time
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -107,7 +148,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PARSER_CLASSES': [
@@ -156,8 +197,22 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+    'x-terminal-id',
 ]
 
+# Token authentication
+TOKEN_TTL = 60 * 60 * 24 * 30  # seconds a token lives after it is issued; None never expires
+TOKEN_CACHE_TTL = 60 * 5  # seconds a token lookup stays in the shared cache; not used with LocMemCache
+TOKEN_CACHE_LOCAL_TTL = 10  # seconds in each process's own LRU, also how stale other processes can be
+TOKEN_CACHE_LOCAL_SIZE = 1024  # tokens kept per process
+
+DEBUG_LOG_SAMPLE_RATE = 0.01  # share of hot-path debug lines (permission checks) that get logged
+
+# Stored responses for POSTs sent with an Idempotency-Key header
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24  # 24 hours, in seconds
+IDEMPOTENCY_LOCK_TIMEOUT = 60  # seconds before an unfinished request can be retried
+
 # CSRF settings
 CSRF_COOKIE_NAME = "csrftoken"
 CSRF_HEADER_NAME = "X-CSRFToken"
@@ -167,12 +222,26 @@ CSRF_USE_SESSIONS = False
 CSRF_COOKIE_SECURE = not DEBUG
 
 # Session settings
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Cache first with batched database writes; set DJANGO_SESSION_ENGINE to
+# 'django.contrib.sessions.backends.signed_cookies' to keep no server state.
+# That engine needs a cache every worker shares, so with the per-process
+# LocMemCache the default is plain database sessions
+SESSION_ENGINE = os.environ.get(
+    'DJANGO_SESSION_ENGINE',
+    'django.contrib.sessions.backends.db'
+    if CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache'
+    else 'barMan_backend.sessions',
+)
+SESSION_CACHE_ALIAS = 'default'
+SESSION_WRITE_BEHIND = True  # False writes every save through to the database
+SESSION_WRITE_BEHIND_WINDOW = 5  # seconds of saves collected into one database write
 SESSION_COOKIE_AGE = 1209600  # 2 weeks, in seconds
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = not DEBUG  # Use secure cookie in production
-SESSION_SAVE_EVERY_REQUEST = True
+# SessionRefreshMiddleware renews the expiry instead, once it is this close
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_THRESHOLD = 60 * 60 * 24 * 7  # 1 week, in seconds
 
 LOGGING = {
     'version': 1,
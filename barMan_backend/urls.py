@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from users.views import CustomAuthToken
+from users.views import CustomAuthToken, RotateTokenView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,7 +10,9 @@ urlpatterns = [
         path('sales/', include('sales.urls')),
         path('customers/', include('customers.urls')),
         path('users/', include('users.urls')),
+        path('sync/', include('sync.urls')),
         path('token-auth/', CustomAuthToken.as_view(), name='api_token_auth'),
+        path('token-rotate/', RotateTokenView.as_view(), name='api_token_rotate'),
     ])),
     path('api-auth/', include('rest_framework.urls')),
 ]
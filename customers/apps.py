@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CustomersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'customers'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from barMan_backend.cache_versions import track_changes
+        from .models import refresh_tab_credit
+        Customer = self.get_model('Customer')
+        track_changes(Customer)
+        track_changes(self.get_model('CustomerTab'))
+        post_save.connect(refresh_tab_credit, sender=Customer, dispatch_uid='customers-refresh-tab-credit')
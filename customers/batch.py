@@ -0,0 +1,194 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from barMan_backend.cache_versions import bump_model
+from sync import changes
+from .models import Customer, CustomerTab
+from .serializers import CustomerSerializer, CustomerTabSerializer
+
+logger = logging.getLogger(__name__)
+
+class BatchError(Exception):
+    def __init__(self, detail, index, applied=None):
+        self.detail = detail
+        self.index = index
+        # Results of the operations that ran before the failing one
+        self.applied = applied
+        super().__init__(detail)
+
+
+def _page_size():
+    return getattr(settings, 'BATCH_READ_MAX_PAGE_SIZE', 1000)
+
+
+def _read_params(params):
+    if params is None:
+        return {}
+    if not isinstance(params, dict):
+        raise ValueError("data must be an object")
+    params = dict(params)
+    for key in ('after', 'limit'):
+        if key in params:
+            params[key] = int(params[key] or 0)
+    for key in ('ids', 'customer_ids'):
+        if params.get(key) is not None:
+            params[key] = [int(pk) for pk in params[key]]
+    return params
+
+
+def _read(queryset, serializer_class, params, key):
+    # Without after/limit a read returns every row, as the endpoint always has;
+    # with them it is a keyset page over pk
+    if params.get('ids') is not None:
+        queryset = queryset.filter(pk__in=params['ids'])
+    queryset = queryset.order_by('pk')
+    results = {}
+    if 'after' in params or 'limit' in params:
+        limit = min(max(params.get('limit') or _page_size(), 1), _page_size())
+        rows = list(queryset.filter(pk__gt=params.get('after', 0))[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        results[f'{key}NextAfter'] = rows[-1].pk if has_more else None
+    else:
+        rows = queryset
+    results[key] = serializer_class(rows, many=True).data
+    return results
+
+
+def read_customers(params):
+    queryset = Customer.objects.all()
+    if params.get('search'):
+        queryset = queryset.filter(name__icontains=params['search'])
+    return _read(queryset, CustomerSerializer, params, 'customers')
+
+
+def read_tabs(params):
+    queryset = CustomerTab.objects.select_related('customer')
+    if params.get('customer_ids') is not None:
+        queryset = queryset.filter(customer_id__in=params['customer_ids'])
+    if params.get('with_balance'):
+        queryset = queryset.filter(amount__gt=0)
+    return _read(queryset, CustomerTabSerializer, params, 'customerTabs')
+
+
+def _create(serializer_class, model, data, single_key, many_key, unique_field=None, before_create=None, after_create=None):
+    if not isinstance(data, list):
+        serializer = serializer_class(data=data)
+        if not serializer.is_valid():
+            return None, serializer.errors
+        return {single_key: serializer_class(serializer.save()).data}, None
+
+    serializer = serializer_class(data=data, many=True)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    if unique_field:
+        values = [row[unique_field] for row in serializer.validated_data]
+        if len(set(values)) != len(values):
+            return None, {unique_field: ["Duplicate values in batch"]}
+    objects = [model(**row) for row in serializer.validated_data]
+    # bulk_create skips save(); the hooks do the model's part of it
+    if before_create:
+        before_create(objects)
+    created = model.objects.bulk_create(objects)
+    if after_create:
+        after_create(created)
+    # bulk_create skips post_save, so caches and the sync log are told here
+    changes.record(model, [obj.pk for obj in created])
+    bump_model(model)
+    return {many_key: serializer_class(created, many=True).data}, None
+
+
+def _fill_search_keys(customers):
+    for customer in customers:
+        customer.normalize()
+
+
+def _set_available_credit(tabs):
+    CustomerTab.refresh_available_credit([tab.customer_id for tab in tabs])
+    for tab in tabs:
+        tab.available_credit = tab.customer.tab_limit - tab.amount
+
+
+def create_customers(data):
+    return _create(
+        CustomerSerializer, Customer, data, 'createdCustomer', 'createdCustomers',
+        before_create=_fill_search_keys,
+    )
+
+
+def create_tabs(data):
+    return _create(
+        CustomerTabSerializer, CustomerTab, data, 'createdTab', 'createdTabs', unique_field='customer',
+        after_create=_set_available_credit,
+    )
+
+
+READERS = {'getCustomers': read_customers, 'getCustomerTabs': read_tabs}
+WRITERS = {'createCustomer': create_customers, 'createCustomerTab': create_tabs}
+
+
+def is_read_only(operations):
+    return isinstance(operations, list) and all(
+        isinstance(operation, dict) and operation.get('operation') in READERS for operation in operations
+    )
+
+
+def _run_reads(reads):
+    """Run [(index, operation, data)] reads, concurrently when that is safe."""
+    workers = getattr(settings, 'BATCH_READ_WORKERS', 4)
+    # Other connections can't see this one's uncommitted writes, and an open
+    # transaction may hold some, so inside one (atomic mode or under an
+    # Idempotency-Key) reads stay on this connection
+    if len(reads) < 2 or workers < 2 or connection.in_atomic_block:
+        return [READERS[op](data) for _, op, data in reads]
+
+    def run(read):
+        _, op, data = read
+        try:
+            return READERS[op](data)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(reads))) as executor:
+        return list(executor.map(run, reads))
+
+
+def _execute(operations):
+    results = {}
+    reads = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise BatchError({"error": "Each operation must be an object"}, index, results)
+        op_type = operation.get('operation')
+        op_data = operation.get('data')
+        logger.info(f"Processing operation: {op_type}")
+        if op_type in READERS:
+            try:
+                reads.append((index, op_type, _read_params(op_data)))
+            except (TypeError, ValueError) as e:
+                raise BatchError({"error": f"Invalid read parameters: {e}"}, index, results)
+            continue
+        if op_type not in WRITERS:
+            raise BatchError({"error": f"Unknown operation: {op_type}"}, index, results)
+        # Reads queued before a write see the data as it was before it
+        for result in _run_reads(reads):
+            results.update(result)
+        reads = []
+        result, errors = WRITERS[op_type](op_data)
+        if errors is not None:
+            raise BatchError(errors, index, results)
+        results.update(result)
+    for result in _run_reads(reads):
+        results.update(result)
+    return results
+
+
+def run(operations, atomic=False):
+    """Run a batch; with atomic, a failing operation rolls back every write before it."""
+    if not isinstance(operations, list):
+        raise BatchError({"error": "operations must be a list"}, None)
+    if atomic:
+        with transaction.atomic():
+            return _execute(operations)
+    return _execute(operations)
@@ -0,0 +1,43 @@
+from decimal import Decimal
+from django.db.models import DecimalField, F
+from django.db.models.functions import Coalesce
+from .models import Customer
+
+
+def available(customer_ids):
+    """Return {customer_id: (available_credit, tab_limit)} in one query.
+
+    Customers without a tab have their whole limit available.
+    """
+    rows = (
+        Customer.objects.filter(pk__in=customer_ids)
+        .annotate(available=Coalesce(F('tab__available_credit'), F('tab_limit'), output_field=DecimalField(max_digits=12, decimal_places=2)))
+        .values_list('pk', 'available', 'tab_limit')
+    )
+    return {pk: (credit, limit) for pk, credit, limit in rows}
+
+
+def check(requests):
+    """Check [{customer, amount}] against available credit in one query.
+
+    Amounts for the same customer are added up, so a round split across
+    several tabs is judged as a whole.
+    """
+    wanted = {}
+    for request in requests:
+        wanted[request['customer']] = wanted.get(request['customer'], Decimal('0.00')) + request['amount']
+    credit = available(wanted)
+    results = []
+    for customer_id, amount in wanted.items():
+        if customer_id not in credit:
+            results.append({"customer": customer_id, "requested": amount, "available": None, "ok": False, "error": "Customer not found"})
+            continue
+        customer_credit, tab_limit = credit[customer_id]
+        results.append({
+            "customer": customer_id,
+            "requested": amount,
+            "available": customer_credit,
+            "tab_limit": tab_limit,
+            "ok": amount <= customer_credit,
+        })
+    return results
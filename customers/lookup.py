@@ -0,0 +1,58 @@
+import re
+from django.conf import settings
+
+# Upper bound for a prefix range: sorts after anything that starts with the prefix
+RANGE_END = '\U0010ffff'
+
+NON_DIGITS = re.compile(r'\D')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_name(name):
+    return WHITESPACE.sub(' ', (name or '').strip()).casefold()
+
+
+def _country_code():
+    return getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', '234')
+
+
+def normalize_phone(phone):
+    """Digits only, with the country code: '0803 123 4567' -> '2348031234567'."""
+    raw = (phone or '').strip()
+    digits = NON_DIGITS.sub('', raw)
+    if raw.startswith('+'):
+        return digits
+    if digits.startswith('00'):
+        return digits[2:]
+    if digits.startswith('0'):
+        return _country_code() + digits[1:]
+    return digits
+
+
+def prefix_range(field, prefix):
+    # field >= prefix AND field < prefix + max char: an index range scan,
+    # where LIKE 'prefix%' would be a full scan under SQLite's default collation
+    return {f'{field}__gte': prefix, f'{field}__lt': prefix + RANGE_END}
+
+
+def phone_prefixes(q):
+    digits = NON_DIGITS.sub('', q)
+    if len(digits) < 3:
+        return []
+    if q.strip().startswith(('+', '0')):
+        return [normalize_phone(q)]
+    # Bare digits could be typed with or without the country code
+    return [digits] if digits.startswith(_country_code()) else [digits, _country_code() + digits]
+
+
+def search(queryset, q, limit):
+    """Customers whose name or phone number starts with q, name order, at most limit."""
+    found = {}
+    name = normalize_name(q)
+    if name:
+        for customer in queryset.filter(**prefix_range('name_normalized', name)).order_by('name_normalized', 'pk')[:limit]:
+            found[customer.pk] = customer
+    for prefix in phone_prefixes(q):
+        for customer in queryset.filter(**prefix_range('phone_normalized', prefix)).order_by('phone_normalized', 'pk')[:limit]:
+            found.setdefault(customer.pk, customer)
+    return sorted(found.values(), key=lambda customer: (customer.name_normalized, customer.pk))[:limit]
@@ -0,0 +1,70 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from barMan_backend.cache_versions import bump_model
+from customers.models import Customer, CustomerTab
+from sales.models import Sale
+from sync import changes
+
+class Command(BaseCommand):
+    help = 'Verify customer tab balances against pending sales and repair drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Customers checked per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report mismatches without writing')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        checked = repaired = created = 0
+        last_id = 0
+
+        while True:
+            customer_ids = list(
+                Customer.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not customer_ids:
+                break
+            last_id = customer_ids[-1]
+
+            with transaction.atomic():
+                expected = dict(
+                    Sale.objects.filter(customer_id__in=customer_ids, payment_status='PENDING')
+                    .values_list('customer_id')
+                    .annotate(total=Sum('total_amount'))
+                )
+                tabs = {tab.customer_id: tab for tab in CustomerTab.objects.filter(customer_id__in=customer_ids)}
+
+                to_update = []
+                to_create = []
+                now = timezone.now()
+                for customer_id in customer_ids:
+                    amount = expected.get(customer_id) or Decimal('0.00')
+                    tab = tabs.get(customer_id)
+                    if tab is None:
+                        if amount:
+                            to_create.append(CustomerTab(customer_id=customer_id, amount=amount))
+                    elif tab.amount != amount:
+                        self.stdout.write(f'Customer {customer_id}: tab {tab.amount} != pending {amount}')
+                        tab.amount = amount
+                        tab.updated_at = now
+                        to_update.append(tab)
+
+                if not dry_run:
+                    CustomerTab.objects.bulk_update(to_update, ['amount', 'updated_at'])
+                    CustomerTab.objects.bulk_create(to_create)
+                    if to_update or to_create:
+                        CustomerTab.refresh_available_credit([tab.customer_id for tab in to_update + to_create])
+                        changes.record(CustomerTab, [tab.pk for tab in to_update + to_create])
+                        bump_model(CustomerTab)
+
+            checked += len(customer_ids)
+            repaired += len(to_update)
+            created += len(to_create)
+
+        prefix = 'Dry run: ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}checked {checked} customers, {repaired} tabs out of balance, {created} tabs missing'
+        ))
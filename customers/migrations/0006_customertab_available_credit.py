@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:05
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill_available_credit(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    CustomerTab = apps.get_model('customers', 'CustomerTab')
+    CustomerTab.objects.update(
+        available_credit=Subquery(Customer.objects.filter(pk=OuterRef('customer_id')).values('tab_limit')[:1]) - F('amount')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0005_customer_tab_limit_alter_customertab_customer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customertab',
+            name='available_credit',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='customertab',
+            index=models.Index(fields=['available_credit'], name='customers_tab_credit_idx'),
+        ),
+        migrations.RunPython(backfill_available_credit, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:07
+
+import re
+from django.conf import settings
+from django.db import migrations, models
+
+# Copies of customers.lookup as of this migration, so later changes there
+# cannot alter what it writes
+NON_DIGITS = re.compile(r'\D')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_name(name):
+    return WHITESPACE.sub(' ', (name or '').strip()).casefold()
+
+
+def normalize_phone(phone):
+    raw = (phone or '').strip()
+    digits = NON_DIGITS.sub('', raw)
+    if raw.startswith('+'):
+        return digits
+    if digits.startswith('00'):
+        return digits[2:]
+    if digits.startswith('0'):
+        return getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', '234') + digits[1:]
+    return digits
+
+
+def fill_search_keys(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    customers = list(Customer.objects.only('pk', 'name', 'phone_number'))
+    for customer in customers:
+        customer.name_normalized = normalize_name(customer.name)
+        customer.phone_normalized = normalize_phone(customer.phone_number)
+    Customer.objects.bulk_update(customers, ['name_normalized', 'phone_normalized'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0006_customertab_available_credit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='name_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+    ]
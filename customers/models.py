@@ -1,27 +1,119 @@
 from django.db import models
-from django.db.models import Sum
+from django.db.models import Sum, F, OuterRef, Subquery
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from barMan_backend.cache_versions import bump_model
+from sync import changes
+from . import lookup
 
 class Customer(models.Model):
     name = models.CharField(max_length=100)
     phone_number = models.CharField(max_length=20)
     tab_limit = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), validators=[MinValueValidator(Decimal('0.00'))])
+    # Search keys kept in step with name and phone_number by save()
+    name_normalized = models.CharField(max_length=100, db_index=True, editable=False, default='')
+    phone_normalized = models.CharField(max_length=20, db_index=True, editable=False, default='')
 
     def __str__(self):
         return self.name
 
+    def normalize(self):
+        self.name_normalized = lookup.normalize_name(self.name)
+        self.phone_normalized = lookup.normalize_phone(self.phone_number)
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'name_normalized', 'phone_normalized'}
+        super().save(*args, **kwargs)
+
 class CustomerTab(models.Model):
     customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name='tab')
     amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    # customer.tab_limit - amount, moved in the same statements as amount
+    available_credit = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['available_credit'], name='customers_tab_credit_idx'),
+        ]
+
     def __str__(self):
         return f"{self.customer.name} - ₦{self.amount}"
 
+    def save(self, *args, **kwargs):
+        self.available_credit = self.customer.tab_limit - Decimal(self.amount)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'amount' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'available_credit'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def refresh_available_credit(cls, customer_ids):
+        # For writes that set amount or tab_limit outright
+        tabs = cls.objects.filter(customer_id__in=customer_ids)
+        updated = tabs.update(
+            available_credit=Subquery(Customer.objects.filter(pk=OuterRef('customer_id')).values('tab_limit')[:1]) - F('amount')
+        )
+        if updated:
+            changes.record(cls, tabs.values_list('pk', flat=True))
+            bump_model(cls)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        # deltas maps customer_id -> signed change of the pending balance
+        updated_customers = []
+        for customer_id, delta in deltas.items():
+            if not delta:
+                continue
+            moved = {
+                'amount': F('amount') + delta,
+                'available_credit': F('available_credit') - delta,
+                'updated_at': timezone.now(),
+            }
+            updated = cls.objects.filter(customer_id=customer_id).update(**moved)
+            if not updated:
+                tab, created = cls.objects.get_or_create(customer_id=customer_id, defaults={'amount': delta})
+                if not created:
+                    cls.objects.filter(pk=tab.pk).update(**moved)
+            updated_customers.append(customer_id)
+            bump_model(cls)
+        if updated_customers:
+            changes.record(cls, cls.objects.filter(customer_id__in=updated_customers).values_list('pk', flat=True))
+
+    @classmethod
+    def apply_deltas_bulk(cls, deltas, tabs):
+        # tabs maps customer_id -> prefetched CustomerTab (or None when missing)
+        now = timezone.now()
+        to_update = []
+        to_create = []
+        for customer_id, delta in deltas.items():
+            if not delta:
+                continue
+            tab = tabs.get(customer_id)
+            if tab is None:
+                to_create.append(cls(customer_id=customer_id, amount=delta))
+            else:
+                tab.amount = F('amount') + delta
+                tab.available_credit = F('available_credit') - delta
+                tab.updated_at = now
+                to_update.append(tab)
+        cls.objects.bulk_update(to_update, ['amount', 'available_credit', 'updated_at'])
+        cls.objects.bulk_create(to_create)
+        if to_create:
+            # bulk_create skips save(), which would have set available_credit
+            cls.refresh_available_credit([tab.customer_id for tab in to_create])
+        if to_update or to_create:
+            changes.record(cls, [tab.pk for tab in to_update + to_create])
+            bump_model(cls)
+
     @classmethod
     def update_tab_amount(cls, customer):
+        # Full recompute; the write paths use apply_deltas, this is for repairs
         from sales.models import Sale  # Import here to avoid circular import
         total_pending = Sale.objects.filter(
             customer=customer,
@@ -32,5 +124,8 @@ class CustomerTab(models.Model):
         tab.amount = total_pending
         tab.save()
 
-        # Remove any extra tabs for this customer
-        cls.objects.filter(customer=customer).exclude(pk=tab.pk).delete()
+
+def refresh_tab_credit(sender, instance, created, update_fields=None, **kwargs):
+    # A new tab_limit moves the customer's available credit
+    if not created and (update_fields is None or 'tab_limit' in update_fields):
+        CustomerTab.refresh_available_credit([instance.pk])
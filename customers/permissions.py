@@ -1,16 +1,11 @@
 from rest_framework import permissions
-import logging
-
-logger = logging.getLogger(__name__)
+from users.permissions import has
 
 class BasePermission(permissions.BasePermission):
     permission_name = ""
 
     def has_permission(self, request, view):
-        logger.info(f"Checking {self.permission_name} permission for user: {request.user}")
-        has_perm = request.user.is_authenticated and getattr(request.user, self.permission_name, False)
-        logger.info(f"User has {self.permission_name} permission: {has_perm}")
-        return has_perm
+        return has(request, self.permission_name)
 
 class CanUpdateInventory(BasePermission):
     permission_name = "can_update_inventory"
@@ -28,4 +23,4 @@ class CanUpdateTabs(BasePermission):
     permission_name = "can_update_tabs"
 
 class CanManageUsers(BasePermission):
-    permission_name = "can_manage_users"
\ No newline at end of file
+    permission_name = "can_manage_users"
@@ -1,3 +1,4 @@
+from decimal import Decimal
 from rest_framework import serializers
 from .models import Customer, CustomerTab
 
@@ -13,4 +14,16 @@ class CustomerTabSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CustomerTab
-        fields = ['id', 'customer', 'customer_id', 'customer_name', 'amount', 'tab_limit']
\ No newline at end of file
+        fields = ['id', 'customer', 'customer_id', 'customer_name', 'amount', 'tab_limit', 'available_credit']
+        read_only_fields = ['available_credit']
+
+
+class CreditCheckSerializer(serializers.Serializer):
+    customer = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
+
+class SettleSerializer(serializers.Serializer):
+    # Both optional: no sales means every pending sale, no amount means pay in full
+    sales = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'), required=False)
@@ -1,3 +1,292 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from barMan_backend.query_budget import QueryBudgetMixin
+from inventory.models import InventoryItem
+from sales.models import Sale, SaleDailyRollup
+from . import batch
+from .models import Customer, CustomerTab
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(LOW_STOCK_ALERTS_ASYNC=False)
+class CustomerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password', can_update_tabs=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.item = InventoryItem.objects.create(name='Beer', cost=Decimal('2.50'), quantity=100)
+        self.customer = Customer.objects.create(name='Bob', phone_number='08030000000', tab_limit=Decimal('100.00'))
+
+    def sell(self, quantity, customer=None, **extra):
+        data = {'item': self.item.pk, 'quantity': quantity, 'customer': (customer or self.customer).pk, **extra}
+        response = self.client.post('/api/sales/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def tab(self, customer=None):
+        tab = CustomerTab.objects.filter(customer=customer or self.customer).first()
+        return tab.amount if tab else Decimal('0.00')
+
+
+class SettleTests(CustomerTestCase):
+    def setUp(self):
+        super().setUp()
+        # 2.50, 5.00, 2.50 and 7.50, oldest first
+        self.sales = [self.sell(quantity) for quantity in (1, 2, 1, 3)]
+        self.url = f'/api/customers/{self.customer.pk}/settle/'
+
+    def settle(self, data):
+        return self.client.post(self.url, data, format='json')
+
+    def test_amount_settles_the_oldest_sales_it_covers_exactly(self):
+        response = self.settle({'amount': '7.50'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['settled'], self.sales[:2])
+        self.assertEqual(response.data['tab_amount'], Decimal('10.00'))
+        self.assertEqual(self.tab(), Decimal('10.00'))
+
+    def test_amount_with_a_remainder_is_rejected_and_settles_nothing(self):
+        for amount in ('9.00', '1.00', '50.00'):
+            response = self.settle({'amount': amount})
+            self.assertEqual(response.status_code, 400, amount)
+        self.assertEqual(response.data['covered'], Decimal('17.50'))
+        self.assertIsNone(response.data['next_amount'])
+        response = self.settle({'amount': '9.00'})
+        self.assertEqual((response.data['covered'], response.data['next_amount']), (Decimal('7.50'), Decimal('10.00')))
+        self.assertEqual(self.tab(), Decimal('17.50'))
+        self.assertEqual(Sale.objects.filter(payment_status='PENDING').count(), 4)
+
+    def test_zero_amount_is_rejected(self):
+        self.assertEqual(self.settle({'amount': '0.00'}).status_code, 400)
+
+    def test_unknown_sales_are_rejected(self):
+        response = self.settle({'sales': [self.sales[1], 999999]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['sales'], [999999])
+        self.assertEqual(self.tab(), Decimal('17.50'))
+
+    def test_settling_everything_clears_the_tab_and_moves_the_rollups(self):
+        response = self.settle({})
+        self.assertEqual(response.data['settled'], self.sales)
+        self.assertEqual(self.tab(), Decimal('0.00'))
+        self.assertFalse(Sale.objects.filter(payment_status='PENDING').exists())
+        totals = dict(
+            SaleDailyRollup.objects.values_list('payment_status').annotate(total=Sum('total_amount'))
+        )
+        self.assertEqual(totals, {'DONE': Decimal('17.50'), 'PENDING': Decimal('0.00')})
+
+
+class CreditTests(CustomerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = Customer.objects.create(name='Alice', phone_number='08031111111', tab_limit=Decimal('20.00'))
+
+    def available_credit(self, customer=None):
+        return CustomerTab.objects.get(customer=customer or self.customer).available_credit
+
+    def test_credit_check_adds_up_each_customers_amounts(self):
+        self.sell(4)
+        response = self.client.post('/api/customers/credit-check/', [
+            {'customer': self.customer.pk, 'amount': '50.00'},
+            {'customer': self.alice.pk, 'amount': '15.00'},
+            {'customer': self.customer.pk, 'amount': '45.00'},
+            {'customer': self.alice.pk, 'amount': '5.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        results = {result['customer']: result for result in response.data['results']}
+        self.assertEqual(
+            (results[self.customer.pk]['requested'], results[self.customer.pk]['available'], results[self.customer.pk]['ok']),
+            (Decimal('95.00'), Decimal('90.00'), False),
+        )
+        self.assertEqual(
+            (results[self.alice.pk]['requested'], results[self.alice.pk]['available'], results[self.alice.pk]['ok']),
+            (Decimal('20.00'), Decimal('20.00'), True),
+        )
+        self.assertFalse(response.data['ok'])
+
+    def test_credit_check_reports_an_unknown_customer(self):
+        response = self.client.post('/api/customers/credit-check/', [
+            {'customer': self.alice.pk, 'amount': '5.00'},
+            {'customer': 999999, 'amount': '1.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(response.data['ok'])
+        unknown = next(result for result in response.data['results'] if result['customer'] == 999999)
+        self.assertEqual((unknown['available'], unknown['ok'], unknown['error']), (None, False, 'Customer not found'))
+
+    def test_available_credit_follows_a_new_tab_limit(self):
+        self.sell(4)
+        response = self.client.patch(f'/api/customers/{self.customer.pk}/update_tab_limit/', {'tab_limit': '150.00'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.available_credit(), Decimal('140.00'))
+        self.customer.tab_limit = Decimal('30.00')
+        self.customer.save(update_fields=['tab_limit'])
+        self.assertEqual(self.available_credit(), Decimal('20.00'))
+
+    def test_available_credit_follows_the_tab_amount(self):
+        CustomerTab.apply_deltas({self.customer.pk: Decimal('12.50'), self.alice.pk: Decimal('5.00')})
+        CustomerTab.apply_deltas({self.customer.pk: Decimal('-2.50')})
+        self.assertEqual((self.tab(), self.available_credit()), (Decimal('10.00'), Decimal('90.00')))
+        self.assertEqual(self.available_credit(self.alice), Decimal('15.00'))
+
+    def test_batch_created_tabs_get_their_available_credit(self):
+        response = self.client.post('/api/customers/batch/', [{'operation': 'createCustomerTab', 'data': [
+            {'customer': self.customer.pk, 'amount': '30.00'},
+            {'customer': self.alice.pk, 'amount': '5.00'},
+        ]}], format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            sorted(Decimal(tab['available_credit']) for tab in response.data['createdTabs']),
+            [Decimal('15.00'), Decimal('70.00')],
+        )
+        self.assertEqual((self.available_credit(), self.available_credit(self.alice)), (Decimal('70.00'), Decimal('15.00')))
+
+    def test_refused_sale_leaves_no_tab_behind(self):
+        response = self.client.post('/api/sales/', {'item': self.item.pk, 'quantity': 9, 'customer': self.alice.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['required_limit'], '22.50')
+        self.assertFalse(CustomerTab.objects.filter(customer=self.alice).exists())
+        self.assertFalse(Sale.objects.exists())
+
+
+class SearchTests(CustomerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mary = Customer.objects.create(name='Mary  Ann', phone_number='0803 123 4567')
+        self.jo = Customer.objects.create(name='mary jo', phone_number='+2348059876543')
+        Customer.objects.create(name='Marty', phone_number='08070000000')
+        Customer.objects.create(name='Anne Mary', phone_number='08090000000')
+
+    def search(self, q, **params):
+        response = self.client.get('/api/customers/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [customer['id'] for customer in response.data]
+
+    def test_name_prefix_ignores_case_and_extra_whitespace(self):
+        self.assertEqual(self.search('mary'), [self.mary.pk, self.jo.pk])
+        self.assertEqual(self.search('  MARY   a'), [self.mary.pk])
+        self.assertEqual(self.search('Mary Ann Smith'), [])
+
+    def test_phone_matches_local_international_and_bare_digits(self):
+        for q in ('0803 123', '+234 803 123', '234803123', '803123', '08031234567'):
+            self.assertEqual(self.search(q), [self.mary.pk], q)
+        self.assertEqual(self.search('0805'), [self.jo.pk])
+        self.assertEqual(self.search('80'), [])
+
+    def test_limit_defaults_and_is_capped(self):
+        Customer.objects.bulk_create(
+            Customer(name=f'Customer {i:02}', phone_number=f'0811{i:07}', name_normalized=f'customer {i:02}')
+            for i in range(60)
+        )
+        self.assertEqual(len(self.search('customer')), 20)
+        self.assertEqual(len(self.search('customer', limit=5)), 5)
+        with override_settings(CUSTOMER_SEARCH_MAX_LIMIT=30):
+            self.assertEqual(len(self.search('customer', limit=100)), 30)
+        self.assertEqual(len(self.search('customer', limit=0)), 1)
+        response = self.client.get('/api/customers/', {'q': 'customer', 'limit': 'all'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchTests(CustomerTestCase):
+    url = '/api/customers/batch/'
+
+    def test_bare_list_failure_keeps_the_serializer_errors_body(self):
+        response = self.client.post(self.url, [{'operation': 'createCustomer', 'data': {'name': ''}}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'name', 'phone_number'})
+        response = self.client.post(self.url, [{'operation': 'bogus'}], format='json')
+        self.assertEqual(response.data, {'error': 'Unknown operation: bogus'})
+
+    def test_atomic_failure_uses_the_envelope_and_keeps_nothing(self):
+        response = self.client.post(self.url, {'atomic': True, 'operations': [
+            {'operation': 'createCustomer', 'data': {'name': 'Ann', 'phone_number': '08031111111'}},
+            {'operation': 'createCustomerTab', 'data': [{'customer': self.customer.pk}, {'customer': self.customer.pk}]},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['failedOperation'], 1)
+        self.assertEqual(response.data['errors'], {'customer': ['Duplicate values in batch']})
+        self.assertIsNone(response.data['applied'])
+        self.assertFalse(Customer.objects.filter(name='Ann').exists())
+
+    def test_reads_after_a_write_in_a_transaction_see_it_on_this_connection(self):
+        with mock.patch.object(batch, 'ThreadPoolExecutor', side_effect=AssertionError('pool used')):
+            response = self.client.post(self.url, {'atomic': True, 'operations': [
+                {'operation': 'createCustomer', 'data': {'name': 'Ann', 'phone_number': '08031111111'}},
+                {'operation': 'getCustomers'},
+                {'operation': 'getCustomerTabs'},
+            ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([row['name'] for row in response.data['customers']], ['Bob', 'Ann'])
+
+    def test_customers_created_as_a_list_get_their_search_keys(self):
+        response = self.client.post(self.url, [{'operation': 'createCustomer', 'data': [
+            {'name': 'Ann  Lee', 'phone_number': '0803 111 1111'},
+            {'name': 'Tom', 'phone_number': '08032222222'},
+        ]}], format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            sorted(Customer.objects.filter(name__in=['Ann  Lee', 'Tom']).values_list('name_normalized', 'phone_normalized')),
+            [('ann lee', '2348031111111'), ('tom', '2348032222222')],
+        )
+
+
+@override_settings(BATCH_READ_WORKERS=2)
+class BatchReadPoolTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', 'clerk@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Customer.objects.create(name='Bob', phone_number='08030000000')
+
+    def test_read_only_batch_uses_the_pool_despite_an_idempotency_key(self):
+        operations = [{'operation': 'getCustomers'}, {'operation': 'getCustomerTabs'}]
+        with mock.patch.object(batch, 'ThreadPoolExecutor', wraps=batch.ThreadPoolExecutor) as pool:
+            response = self.client.post(
+                '/api/customers/batch/', operations, format='json', HTTP_IDEMPOTENCY_KEY='reads-1'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        pool.assert_called_once()
+        self.assertEqual([row['name'] for row in response.data['customers']], ['Bob'])
+        self.assertEqual(response.data['customerTabs'], [])
+
+    def test_reads_in_a_batch_with_writes_stay_on_the_request_connection(self):
+        operations = [
+            {'operation': 'getCustomers'},
+            {'operation': 'getCustomerTabs'},
+            {'operation': 'createCustomer', 'data': {'name': 'Ann', 'phone_number': '08031111111'}},
+            {'operation': 'getCustomerTabs'},
+        ]
+        with mock.patch.object(batch, 'ThreadPoolExecutor', side_effect=AssertionError('pool used')):
+            response = self.client.post(
+                '/api/customers/batch/', operations, format='json', HTTP_IDEMPOTENCY_KEY='mixed-1'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['createdCustomer']['name'], 'Ann')
+
+
+class QueryBudgetTests(QueryBudgetMixin, CustomerTestCase):
+    def add_customers(self, count=20, tabs=False):
+        customers = Customer.objects.bulk_create(
+            [Customer(name=f'Customer {i}', phone_number=f'0802{i:07d}') for i in range(count)]
+        )
+        if tabs:
+            CustomerTab.objects.bulk_create([CustomerTab(customer=customer) for customer in customers])
+
+    def test_customer_list(self):
+        self.assertQueryCountFlat(self.client, '/api/customers/', grow=self.add_customers)
+
+    def test_customer_search(self):
+        self.add_customers(60)
+        self.page_size_param = 'limit'
+        self.assertQueryCountFlat(self.client, '/api/customers/', q='Customer')
+
+    def test_tab_list(self):
+        self.add_customers(tabs=True)
+        self.assertQueryCountFlat(self.client, '/api/customers/tabs/', grow=lambda: self.add_customers(tabs=True))
@@ -7,6 +7,7 @@ router.register(r'tabs', CustomerTabViewSet, basename='customertab')
 router.register(r'', CustomerViewSet, basename='customer')
 
 urlpatterns = [
-    path('', include(router.urls)),
+    # Before the router, whose customer detail route would otherwise swallow batch/
     path('batch/', BatchCustomerOperations.as_view(), name='batch-customer-operations'),
+    path('', include(router.urls)),
 ]
\ No newline at end of file
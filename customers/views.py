@@ -1,15 +1,23 @@
+from decimal import Decimal
+from django.conf import settings
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.views import APIView
 from .models import Customer, CustomerTab
-from .serializers import CustomerSerializer, CustomerTabSerializer
+from .serializers import CustomerSerializer, CustomerTabSerializer, CreditCheckSerializer, SettleSerializer
+from . import batch, credit, lookup
 from .permissions import CanCreateCustomers, CanCreateTabs, CanUpdateTabs
 from rest_framework.response import Response
+from sales.idempotency import idempotent
+from sales import settlement
+from barMan_backend.log_filters import DebugSampler
+from barMan_backend.etags import VersionedETagMixin
 import logging
 
 logger = logging.getLogger(__name__)
+log_sample = DebugSampler(logger)
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(VersionedETagMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
 
@@ -38,18 +46,63 @@ class CustomerViewSet(viewsets.ModelViewSet):
             return Response({"message": "Tab limit updated successfully"}, status=status.HTTP_200_OK)
         return Response({"error": "No tab_limit provided"}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], url_path='credit-check')
+    def credit_check(self, request):
+        # A whole round's [{customer, amount}] pairs against available credit
+        serializer = CreditCheckSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        results = credit.check(serializer.validated_data)
+        return Response({"ok": all(result['ok'] for result in results), "results": results})
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def settle(self, request, pk=None):
+        customer = self.get_object()
+        serializer = SettleSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = settlement.settle(
+                customer,
+                sale_ids=serializer.validated_data.get('sales'),
+                amount=serializer.validated_data.get('amount'),
+            )
+        except settlement.SettlementError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        tab = CustomerTab.objects.filter(customer=customer).values_list('amount', 'available_credit').first()
+        result['tab_amount'], result['available_credit'] = tab or (Decimal('0.00'), customer.tab_limit)
+        return Response(result)
+
     def get_permissions(self):
         if self.action == 'create':
             permission_classes = [CanCreateCustomers]
+        elif self.action == 'settle':
+            permission_classes = [CanUpdateTabs]
         else:
             permission_classes = [permissions.IsAuthenticated]
-        logger.info(f"Action: {self.action}, Permission classes: {[p.__name__ for p in permission_classes]}")
+        if log_sample():
+            logger.debug(f"Action: {self.action}, Permission classes: {[p.__name__ for p in permission_classes]}")
         return [permission() for permission in permission_classes]
 
     def list(self, request, *args, **kwargs):
         logger.info("Retrieving customer list")
+        q = request.query_params.get('q', '').strip()
+        if q:
+            return self.search(q)
         return super().list(request, *args, **kwargs)
 
+    def search(self, q):
+        # Name or phone prefix, always a bounded page rather than the whole table
+        limit = getattr(settings, 'CUSTOMER_SEARCH_LIMIT', 20)
+        try:
+            limit = int(self.request.query_params.get('limit', limit))
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), getattr(settings, 'CUSTOMER_SEARCH_MAX_LIMIT', 50))
+        customers = lookup.search(self.filter_queryset(self.get_queryset()), q, limit)
+        return Response(self.get_serializer(customers, many=True).data)
+
     def retrieve(self, request, *args, **kwargs):
         logger.info(f"Retrieving customer details for ID: {kwargs.get('pk')}")
         return super().retrieve(request, *args, **kwargs)
@@ -68,9 +121,12 @@ class CustomerViewSet(viewsets.ModelViewSet):
         logger.info(f"Deleting customer with ID: {kwargs.get('pk')}")
         return super().destroy(request, *args, **kwargs)
 
-class CustomerTabViewSet(viewsets.ModelViewSet):
-    queryset = CustomerTab.objects.all()
+class CustomerTabViewSet(VersionedETagMixin, viewsets.ModelViewSet):
+    # CustomerTabSerializer reads customer.name and customer.tab_limit
+    queryset = CustomerTab.objects.select_related('customer')
     serializer_class = CustomerTabSerializer
+    # Rows embed the customer's name and limit, so either table changes the ETag
+    etag_models = [CustomerTab, Customer]
 
     def get_permissions(self):
         if self.action == 'create':
@@ -79,7 +135,8 @@ class CustomerTabViewSet(viewsets.ModelViewSet):
             permission_classes = [CanUpdateTabs]
         else:
             permission_classes = [permissions.IsAuthenticated]
-        logger.info(f"Action: {self.action}, Permission classes: {[p.__name__ for p in permission_classes]}")
+        if log_sample():
+            logger.debug(f"Action: {self.action}, Permission classes: {[p.__name__ for p in permission_classes]}")
         return [permission() for permission in permission_classes]
 
     def create(self, request, *args, **kwargs):
@@ -124,40 +181,41 @@ class CustomerTabViewSet(viewsets.ModelViewSet):
 class BatchCustomerOperations(APIView):
     def post(self, request):
         logger.info(f"Received batch operation request: {request.data}")
+        # Either a bare list of operations or {"atomic": true, "operations": [...]}
         operations = request.data
-        results = {}
-
-        for operation in operations:
-            op_type = operation.get('operation')
-            op_data = operation.get('data')
-            logger.info(f"Processing operation: {op_type}")
-
-            if op_type == 'getCustomers':
-                customers = Customer.objects.all()
-                results['customers'] = CustomerSerializer(customers, many=True).data
-            elif op_type == 'getCustomerTabs':
-                tabs = CustomerTab.objects.all()
-                results['customerTabs'] = CustomerTabSerializer(tabs, many=True).data
-            elif op_type == 'createCustomer':
-                serializer = CustomerSerializer(data=op_data)
-                if serializer.is_valid():
-                    customer = serializer.save()
-                    results['createdCustomer'] = CustomerSerializer(customer).data
-                else:
-                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            elif op_type == 'createCustomerTab':
-                serializer = CustomerTabSerializer(data=op_data)
-                if serializer.is_valid():
-                    tab = serializer.save()
-                    results['createdTab'] = CustomerTabSerializer(tab).data
-                else:
-                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                return Response({"error": f"Unknown operation: {op_type}"}, status=status.HTTP_400_BAD_REQUEST)
-
+        atomic = False
+        if isinstance(operations, dict):
+            atomic = bool(operations.get('atomic', False))
+            operations = operations.get('operations')
+        if batch.is_read_only(operations):
+            # Reads are safe to repeat, so they skip the Idempotency-Key
+            # transaction, inside which they could not use the read pool
+            return self.run_batch(request, operations, atomic)
+        return self.run_idempotent(request, operations, atomic)
+
+    @idempotent
+    def run_idempotent(self, request, operations, atomic):
+        return self.run_batch(request, operations, atomic)
+
+    def run_batch(self, request, operations, atomic):
+        try:
+            results = batch.run(operations, atomic=atomic)
+        except batch.BatchError as e:
+            logger.warning(f"Batch operation {e.index} failed: {e.detail}")
+            if not isinstance(request.data, dict):
+                # Bare lists keep the body they always failed with
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                "error": "Batch operation failed",
+                "failedOperation": e.index,
+                "errors": e.detail,
+                # Nothing was kept in atomic mode
+                "applied": None if atomic else e.applied,
+            }, status=status.HTTP_400_BAD_REQUEST)
         return Response(results)
 
     def get_permissions(self):
         permission_classes = [permissions.IsAuthenticated]
-        logger.info(f"Batch operation permissions: {[p.__name__ for p in permission_classes]}")
+        if log_sample():
+            logger.debug(f"Batch operation permissions: {[p.__name__ for p in permission_classes]}")
         return [permission() for permission in permission_classes]
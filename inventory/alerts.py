@@ -0,0 +1,108 @@
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from .models import InventoryItem
+
+logger = logging.getLogger(__name__)
+
+# Item ids whose stock just went down. The request path only enqueues them;
+# a daemon worker collects a batch, de-duplicates it and checks the whole
+# batch against the thresholds in a single query.
+_pending = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_last_alerted = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def low_stock(queryset=None):
+    # Written to match the partial index inventory_low_stock_idx exactly
+    queryset = InventoryItem.objects.all() if queryset is None else queryset
+    return queryset.filter(quantity__lte=F('low_inventory_threshold'), is_deleted=False)
+
+
+def check(item_ids):
+    """Queue a threshold check for item_ids once the current transaction commits."""
+    item_ids = [item_id for item_id in item_ids if item_id is not None]
+    if item_ids:
+        transaction.on_commit(lambda: _enqueue(item_ids))
+
+
+def _enqueue(item_ids):
+    if not _setting('LOW_STOCK_ALERTS_ASYNC', True):
+        process(item_ids)
+        return
+    for item_id in item_ids:
+        _pending.put(item_id)
+    _ensure_worker()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='low-stock-alerts', daemon=True)
+            _worker.start()
+
+
+def _next_batch():
+    batch = {_pending.get()}
+    deadline = time.monotonic() + _setting('LOW_STOCK_ALERT_WINDOW', 2)
+    limit = _setting('LOW_STOCK_ALERT_BATCH_SIZE', 200)
+    while len(batch) < limit:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.add(_pending.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _run():
+    while True:
+        batch = _next_batch()
+        try:
+            process(batch)
+        except Exception as e:
+            logger.error(f"Error processing low stock alerts for items {sorted(batch)}: {str(e)}", exc_info=True)
+        finally:
+            close_old_connections()
+
+
+def process(item_ids):
+    """Alert for every item in item_ids that is at or below its threshold."""
+    cooldown = _setting('LOW_STOCK_ALERT_COOLDOWN', 60 * 15)
+    now = time.monotonic()
+    low = list(
+        low_stock().filter(pk__in=set(item_ids)).values_list('pk', 'name', 'quantity', 'low_inventory_threshold')
+    )
+    alerted = []
+    for item_id, name, quantity, threshold in low:
+        if now - _last_alerted.get(item_id, float('-inf')) < cooldown:
+            continue
+        _last_alerted[item_id] = now
+        send_alert(item_id, name, quantity, threshold)
+        alerted.append(item_id)
+    # Restocked items can alert again as soon as they drop back down
+    low_ids = {item_id for item_id, *_ in low}
+    for item_id in set(item_ids) - low_ids:
+        _last_alerted.pop(item_id, None)
+    return alerted
+
+
+def send_alert(item_id, name, quantity, threshold):
+    # Send notification logic here
+    logger.warning(f"Low inventory alert for item: {name} (id {item_id}, {quantity} left, threshold {threshold})")
+
+
+def item_saved(sender, instance, **kwargs):
+    check([instance.pk])
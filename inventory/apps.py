@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from barMan_backend.cache_versions import track_changes
+        from . import alerts, ledger
+        InventoryItem = self.get_model('InventoryItem')
+        track_changes(InventoryItem)
+        post_save.connect(ledger.item_saved, sender=InventoryItem, dispatch_uid='inventory-ledger-save')
+        post_save.connect(alerts.item_saved, sender=InventoryItem, dispatch_uid='inventory-low-stock-check')
@@ -0,0 +1,23 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from barMan_backend.cache_versions import get_version, version_name, bump_model
+from .models import InventoryItem
+
+
+def list_cache_key(request):
+    # Absolute URI so pagination links in the cached body match the host
+    digest = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return f'inventory:list:{get_version(version_name(InventoryItem))}:{digest}'
+
+
+def get_list(key):
+    return cache.get(key)
+
+
+def set_list(key, data):
+    cache.set(key, data, getattr(settings, 'INVENTORY_CACHE_TIMEOUT', 60 * 15))
+
+
+def invalidate():
+    bump_model(InventoryItem)
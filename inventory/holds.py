@@ -0,0 +1,104 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import InventoryItem, StockHold
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_TERMINAL_ID'
+
+
+class HoldUnavailable(Exception):
+    def __init__(self, shortages):
+        # shortages maps item_id -> (requested, available)
+        self.shortages = shortages
+        super().__init__(f"Not enough unheld stock for items {sorted(shortages)}")
+
+
+def ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_HOLD_TTL', 120))
+
+
+def terminal_id(request):
+    # Terminals name themselves; a client that doesn't is one terminal per user
+    terminal = request.META.get(HEADER, '').strip()[:64]
+    return terminal or f'user:{request.user.pk}'
+
+
+def active(now=None):
+    return StockHold.objects.filter(expires_at__gt=now or timezone.now())
+
+
+def held_by_others(terminal):
+    """Units of the outer query's item held by terminals other than terminal."""
+    holds = active().filter(item=OuterRef('pk')).exclude(terminal=terminal).values('item').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(holds, output_field=IntegerField()), Value(0))
+
+
+def held_quantity(item_id, terminal):
+    holds = active().filter(item_id=item_id).exclude(terminal=terminal)
+    return holds.aggregate(total=Sum('quantity'))['total'] or 0
+
+
+def availability(item_ids, terminal=None):
+    """Return {item_id: quantity minus other terminals' active holds}."""
+    items = InventoryItem.objects.filter(pk__in=item_ids).annotate(held=held_by_others(terminal))
+    return {pk: quantity - held for pk, quantity, held in items.values_list('pk', 'quantity', 'held')}
+
+
+def place(terminal, requested, now=None):
+    """Set terminal's holds to requested ({item_id: quantity}); 0 releases an item.
+
+    All or nothing: if any item lacks unheld stock, no hold changes.
+    """
+    now = now or timezone.now()
+    requested = {item_id: quantity for item_id, quantity in requested.items()}
+    with transaction.atomic():
+        wanted = {item_id: quantity for item_id, quantity in requested.items() if quantity > 0}
+        available = availability(wanted, terminal) if wanted else {}
+        shortages = {
+            item_id: (quantity, max(available.get(item_id, 0), 0))
+            for item_id, quantity in wanted.items()
+            if available.get(item_id, 0) < quantity
+        }
+        if shortages:
+            raise HoldUnavailable(shortages)
+        StockHold.objects.filter(terminal=terminal, item_id__in=requested).delete()
+        StockHold.objects.bulk_create([
+            StockHold(item_id=item_id, terminal=terminal, quantity=quantity, expires_at=now + ttl())
+            for item_id, quantity in wanted.items()
+        ])
+    logger.info(f"Terminal {terminal} holds {wanted}")
+    return list(StockHold.objects.filter(terminal=terminal, expires_at__gt=now).order_by('item_id'))
+
+
+def release(terminal, item_ids=None):
+    holds = StockHold.objects.filter(terminal=terminal)
+    if item_ids is not None:
+        holds = holds.filter(item_id__in=item_ids)
+    return holds.delete()[0]
+
+
+def consume(terminal, sold):
+    # A sale uses up the selling terminal's own hold on those units
+    if terminal is None:
+        return
+    for item_id, quantity in sold.items():
+        holds = StockHold.objects.filter(terminal=terminal, item_id=item_id)
+        holds.update(quantity=F('quantity') - quantity)
+        holds.filter(quantity__lte=0).delete()
+
+
+def sweep(batch_size=1000, now=None):
+    """Delete expired holds in batches; they already count for nothing."""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        batch = list(StockHold.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += StockHold.objects.filter(pk__in=batch).delete()[0]
@@ -0,0 +1,108 @@
+import logging
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import InventoryItem, InventoryMovement, InventorySnapshot
+
+logger = logging.getLogger(__name__)
+
+# Bound used when no later snapshot caps the movement scan
+NO_UPPER_BOUND = 2 ** 63 - 1
+
+
+def record(item_id, change, reason, reference=''):
+    if change:
+        InventoryMovement.objects.create(item_id=item_id, change=change, reason=reason, reference=reference)
+
+
+def record_many(changes, reason, reference=''):
+    # changes maps item_id -> signed quantity change
+    InventoryMovement.objects.bulk_create([
+        InventoryMovement(item_id=item_id, change=change, reason=reason, reference=reference)
+        for item_id, change in changes.items()
+        if change
+    ])
+
+
+def item_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Saves through the model (create, update_quantity, admin) set an absolute
+    # quantity; queryset updates in inventory.stock record their own movements
+    if update_fields is not None and 'quantity' not in update_fields:
+        return
+    if created:
+        record(instance.pk, instance.quantity, 'INITIAL')
+        return
+    # Set by InventoryItem.save from a locked read inside this transaction
+    stored = getattr(instance, '_stored_quantity', None)
+    if stored is not None:
+        record(instance.pk, instance.quantity - stored, 'ADJUSTMENT')
+    instance._stored_quantity = None
+
+
+def take_snapshots(batch_size=1000, only_changed=True):
+    """Snapshot every item's quantity, in batches of batch_size items.
+
+    Each item's quantity and its latest movement id are read in the same
+    statement, so the pair is consistent. With only_changed, items with no
+    movement since their last snapshot are skipped.
+    """
+    latest = InventorySnapshot.objects.filter(item=OuterRef('pk')).order_by('-taken_at', '-id')
+    items = InventoryItem.objects.annotate(
+        last_movement=Coalesce(Max('movements__id'), Value(0)),
+        snapshot_movement=Subquery(latest.values('last_movement_id')[:1]),
+    ).order_by('pk')
+
+    written = 0
+    last_pk = 0
+    while True:
+        batch = list(items.filter(pk__gt=last_pk).values_list('pk', 'quantity', 'last_movement', 'snapshot_movement')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        now = timezone.now()
+        snapshots = [
+            InventorySnapshot(item_id=pk, quantity=quantity, last_movement_id=last_movement, taken_at=now)
+            for pk, quantity, last_movement, snapshot_movement in batch
+            if not only_changed or snapshot_movement is None or snapshot_movement != last_movement
+        ]
+        with transaction.atomic():
+            InventorySnapshot.objects.bulk_create(snapshots)
+        written += len(snapshots)
+    logger.info(f"Took {written} inventory snapshots")
+    return written
+
+
+def annotate_quantity_at(items, when):
+    """Annotate items with quantity_at, their quantity as it stood at when.
+
+    Starts from each item's last snapshot at or before when and adds only
+    the movements recorded after it; the next snapshot after when, if any,
+    caps the scan from above.
+    """
+    before = InventorySnapshot.objects.filter(item=OuterRef('pk'), taken_at__lte=when).order_by('-taken_at', '-id')
+    after = InventorySnapshot.objects.filter(item=OuterRef('pk'), taken_at__gt=when).order_by('taken_at', 'id')
+    items = items.annotate(
+        base_quantity=Coalesce(Subquery(before.values('quantity')[:1]), Value(0)),
+        lower_movement=Coalesce(Subquery(before.values('last_movement_id')[:1]), Value(0)),
+        upper_movement=Coalesce(Subquery(after.values('last_movement_id')[:1]), Value(NO_UPPER_BOUND)),
+    )
+    moved = (
+        InventoryMovement.objects.filter(
+            item=OuterRef('pk'),
+            id__gt=OuterRef('lower_movement'),
+            id__lte=OuterRef('upper_movement'),
+            created_at__lte=when,
+        )
+        .values('item')
+        .annotate(total=Sum('change'))
+        .values('total')
+    )
+    return items.annotate(quantity_at=F('base_quantity') + Coalesce(Subquery(moved), Value(0)))
+
+
+def quantities_at(when, item_ids=None):
+    items = InventoryItem.objects.all()
+    if item_ids is not None:
+        items = items.filter(pk__in=item_ids)
+    return dict(annotate_quantity_at(items, when).values_list('pk', 'quantity_at'))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from inventory import purge
+
+class Command(BaseCommand):
+    help = 'Permanently delete soft-deleted inventory items past their grace period, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Items purged per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be purged without deleting anything')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=60 * 60, help='Seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            self.sweep(max(options['batch_size'], 1), options['dry_run'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def sweep(self, batch_size, dry_run):
+        items = sales = 0
+        for result in purge.sweep(batch_size=batch_size, dry_run=dry_run):
+            if dry_run:
+                for row in result:
+                    self.stdout.write(
+                        f"Would purge item {row['id']} ({row['name']}), deleted {row['delete_requested_at']:%Y-%m-%d}: "
+                        f"{row['sale_count']} sales, {row['pending_amount'] or 0} pending on tabs"
+                    )
+                    items += 1
+                    sales += row['sale_count']
+            else:
+                items += result[0]
+                sales += result[1]
+
+        verb = 'Would purge' if dry_run else 'Purged'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {items} inventory items and {sales} sales'))
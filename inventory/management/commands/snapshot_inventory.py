@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from inventory import ledger
+
+class Command(BaseCommand):
+    help = 'Snapshot every inventory item quantity so point-in-time reads only scan recent movements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Items snapshotted per statement')
+        parser.add_argument('--all', action='store_true', help='Also snapshot items that have not moved since their last snapshot')
+
+    def handle(self, *args, **options):
+        written = ledger.take_snapshots(batch_size=max(options['batch_size'], 1), only_changed=not options['all'])
+        self.stdout.write(self.style.SUCCESS(f'Took {written} inventory snapshots'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from inventory import holds
+
+class Command(BaseCommand):
+    help = 'Delete expired stock holds in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Holds deleted per statement')
+
+    def handle(self, *args, **options):
+        deleted = holds.sweep(batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired stock holds'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_inventoryitem_delete_requested_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('quantity__lte', models.F('low_inventory_threshold'))), fields=['id'], name='inventory_low_stock_idx'),
+        ),
+    ]
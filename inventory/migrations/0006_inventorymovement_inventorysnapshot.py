@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def open_ledger(apps, schema_editor):
+    # Existing stock becomes each item's opening movement and first snapshot
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    InventoryMovement = apps.get_model('inventory', 'InventoryMovement')
+    InventorySnapshot = apps.get_model('inventory', 'InventorySnapshot')
+    now = django.utils.timezone.now()
+    for item_id, quantity in InventoryItem.objects.values_list('pk', 'quantity').iterator():
+        movement = InventoryMovement.objects.create(
+            item_id=item_id, change=quantity, reason='INITIAL', created_at=now
+        )
+        InventorySnapshot.objects.create(
+            item_id=item_id, quantity=quantity, last_movement_id=movement.pk, taken_at=now
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_inventoryitem_low_stock_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.inventoryitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'taken_at'], name='inventory_snapshot_item_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change', models.IntegerField()),
+                ('reason', models.CharField(choices=[('INITIAL', 'Initial'), ('SALE', 'Sale'), ('SALE_EDIT', 'Sale edit'), ('SALE_VOID', 'Sale void'), ('STOCK_TAKE', 'Stock take'), ('ADJUSTMENT', 'Adjustment')], max_length=20)),
+                ('reference', models.CharField(blank=True, default='', max_length=50)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.inventoryitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'id'], name='inventory_movement_item_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_inventorymovement_inventorysnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['delete_requested_at', 'id'], name='inventory_delete_requested_idx'),
+        ),
+    ]
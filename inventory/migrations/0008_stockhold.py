@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_inventoryitem_delete_requested_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terminal', models.CharField(max_length=64)),
+                ('quantity', models.IntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='inventory.inventoryitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'expires_at'], name='inventory_hold_item_idx'), models.Index(fields=['expires_at'], name='inventory_hold_expires_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockhold',
+            constraint=models.UniqueConstraint(fields=('terminal', 'item'), name='inventory_hold_terminal_item_unique'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 import logging
@@ -20,20 +21,108 @@ class InventoryItem(models.Model):
 
     class Meta:
         ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='inventory_low_stock_idx',
+                condition=Q(quantity__lte=F('low_inventory_threshold'), is_deleted=False),
+            ),
+            models.Index(
+                fields=['delete_requested_at', 'id'],
+                name='inventory_delete_requested_idx',
+                condition=Q(is_deleted=True),
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or (update_fields is not None and 'quantity' not in update_fields):
+            return super().save(*args, **kwargs)
+        # The post_save receiver ledgers the change against the stored
+        # quantity, re-read under lock in the same transaction as the write
+        with transaction.atomic():
+            self._stored_quantity = (
+                InventoryItem.objects.select_for_update().filter(pk=self.pk).values_list('quantity', flat=True).first()
+            )
+            super().save(*args, **kwargs)
+
     def soft_delete(self):
         logger.info(f"Soft deleting item {self.id} - {self.name}")
         self.is_deleted = True
         self.delete_requested_at = timezone.now()
-        self.save()
+        self.save(update_fields=['is_deleted', 'delete_requested_at'])
         logger.info(f"Item {self.id} - {self.name} soft deleted successfully")
 
     def restore(self):
         logger.info(f"Restoring item {self.id} - {self.name}")
         self.is_deleted = False
         self.delete_requested_at = None
-        self.save()
-        logger.info(f"Item {self.id} - {self.name} restored successfully")
\ No newline at end of file
+        self.save(update_fields=['is_deleted', 'delete_requested_at'])
+        logger.info(f"Item {self.id} - {self.name} restored successfully")
+
+
+class InventoryMovement(models.Model):
+    # Append-only: every change to InventoryItem.quantity, signed
+    REASON_CHOICES = [
+        ('INITIAL', 'Initial'),
+        ('SALE', 'Sale'),
+        ('SALE_EDIT', 'Sale edit'),
+        ('SALE_VOID', 'Sale void'),
+        ('STOCK_TAKE', 'Stock take'),
+        ('ADJUSTMENT', 'Adjustment'),
+    ]
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='movements')
+    change = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    reference = models.CharField(max_length=50, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Point-in-time reads scan one item's movements between two snapshot ids
+            models.Index(fields=['item', 'id'], name='inventory_movement_item_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id}: {self.change:+d} ({self.reason})"
+
+
+class InventorySnapshot(models.Model):
+    # quantity is the item's stock once every movement up to last_movement_id is applied
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='snapshots')
+    quantity = models.IntegerField()
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['item', 'taken_at'], name='inventory_snapshot_item_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id}: {self.quantity} at {self.taken_at}"
+
+
+class StockHold(models.Model):
+    # Units a terminal has set aside for an open order, until expires_at
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='holds')
+    terminal = models.CharField(max_length=64)
+    quantity = models.IntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['terminal', 'item'], name='inventory_hold_terminal_item_unique'),
+        ]
+        indexes = [
+            # Active holds per item are summed as (item_id = ? AND expires_at > now)
+            models.Index(fields=['item', 'expires_at'], name='inventory_hold_item_idx'),
+            models.Index(fields=['expires_at'], name='inventory_hold_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.terminal}: {self.quantity} x {self.item_id} until {self.expires_at}"
@@ -0,0 +1,96 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from .models import InventoryItem
+
+logger = logging.getLogger(__name__)
+
+
+def grace_period():
+    return timedelta(days=getattr(settings, 'INVENTORY_DELETE_GRACE_DAYS', 30))
+
+
+def expired(now=None):
+    # Matches the partial index inventory_delete_requested_idx
+    cutoff = (now or timezone.now()) - grace_period()
+    return InventoryItem.objects.filter(is_deleted=True, delete_requested_at__lte=cutoff).order_by('delete_requested_at', 'id')
+
+
+def report(item_ids):
+    """What purging item_ids would remove, per item, without changing anything."""
+    return list(
+        InventoryItem.objects.filter(pk__in=item_ids)
+        .annotate(
+            sale_count=Count('sale'),
+            pending_amount=Sum('sale__total_amount', filter=Q(sale__payment_status='PENDING', sale__customer__isnull=False)),
+        )
+        .values('id', 'name', 'delete_requested_at', 'sale_count', 'pending_amount')
+        .order_by('delete_requested_at', 'id')
+    )
+
+
+def _delete_sales(Sale, item_ids, batch_size=500):
+    # A plain DELETE skips the per-row post_delete receivers; batched to stay
+    # under the database's limit on query parameters
+    table = connection.ops.quote_name(Sale._meta.db_table)
+    column = connection.ops.quote_name(Sale._meta.get_field('item').column)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(item_ids), batch_size):
+            batch = item_ids[start:start + batch_size]
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(batch))})", batch)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def purge_items(item_ids):
+    """Hard-delete item_ids and their sales without per-sale signals.
+
+    The sales' pending amounts come off their customers' tabs with one
+    aggregate and one UPDATE per customer; the item's rollups, movements and
+    snapshots go with it by cascade.
+    """
+    from sales.models import Sale  # Import here to avoid circular import
+    from customers.models import CustomerTab
+
+    item_ids = list(item_ids)
+    if not item_ids:
+        return 0, 0
+    sales = Sale.objects.filter(item_id__in=item_ids)
+    with transaction.atomic():
+        pending = (
+            sales.filter(payment_status='PENDING', customer__isnull=False)
+            .values_list('customer_id')
+            .annotate(total=Sum('total_amount'))
+            .order_by()
+        )
+        CustomerTab.apply_deltas({customer_id: -(total or Decimal('0.00')) for customer_id, total in pending})
+        # The tab work the sales' post_delete receivers would do is done
+        # above and the rollups cascade with the item
+        sales_deleted = _delete_sales(Sale, item_ids)
+        items_deleted = InventoryItem.objects.filter(pk__in=item_ids).delete()[1].get(InventoryItem._meta.label, 0)
+    logger.info(f"Purged {items_deleted} inventory items and {sales_deleted} sales")
+    return items_deleted, sales_deleted
+
+
+def sweep(batch_size=100, dry_run=False, now=None):
+    """Purge every expired item in batches of batch_size; yields one result per batch."""
+    last = None
+    while True:
+        batch = expired(now)
+        if last is not None:
+            # Dry runs change nothing, so page past what was already reported
+            batch = batch.filter(Q(delete_requested_at__gt=last[0]) | Q(delete_requested_at=last[0], id__gt=last[1]))
+        batch = list(batch.values_list('delete_requested_at', 'id')[:batch_size])
+        if not batch:
+            return
+        item_ids = [item_id for _, item_id in batch]
+        if dry_run:
+            last = batch[-1]
+            yield report(item_ids)
+        else:
+            yield purge_items(item_ids)
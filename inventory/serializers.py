@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import InventoryItem
+from .models import InventoryItem, StockHold
 
 class InventoryItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,4 +9,25 @@ class InventoryItemSerializer(serializers.ModelSerializer):
 class InventoryItemUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = InventoryItem
-        fields = ['quantity', 'low_inventory_threshold']
\ No newline at end of file
+        fields = ['quantity', 'low_inventory_threshold']
+
+class StockCountSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    delta = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if ('quantity' in data) == ('delta' in data):
+            raise serializers.ValidationError("Provide exactly one of quantity or delta")
+        return data
+
+
+class StockHoldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockHold
+        fields = ['item', 'terminal', 'quantity', 'expires_at']
+
+
+class HoldRequestSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0)
@@ -0,0 +1,119 @@
+import logging
+from django.db import transaction
+from django.db.models import F, Q, Case, When, IntegerField, Value
+from .models import InventoryItem
+from sync import changes
+from . import alerts, cache, holds, ledger
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, item_id, requested, available=None):
+        self.item_id = item_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f"Not enough inventory for item {item_id}: requested {requested}")
+
+
+def _enough(item_id, quantity, terminal):
+    # terminal is None for stock that is already gone (offline imports), which
+    # other terminals' holds cannot stop
+    if terminal is None:
+        return Q(pk=item_id, quantity__gte=quantity)
+    return Q(pk=item_id, quantity__gte=Value(quantity) + holds.held_by_others(terminal))
+
+
+def take(item_id, quantity, reason='SALE', reference='', terminal=None):
+    # Single conditional UPDATE: no read-modify-write, no lost updates
+    if quantity <= 0:
+        return
+    updated = InventoryItem.objects.filter(_enough(item_id, quantity, terminal)).update(
+        quantity=F('quantity') - quantity
+    )
+    if not updated:
+        logger.info(f"Stock decrement refused for item {item_id}: requested {quantity}")
+        raise InsufficientStock(item_id, quantity)
+    ledger.record(item_id, -quantity, reason, reference)
+    changes.record(InventoryItem, [item_id])
+    holds.consume(terminal, {item_id: quantity})
+    cache.invalidate()
+    alerts.check([item_id])
+
+
+def take_many(demands, reason='SALE', reference='', terminal=None):
+    # demands maps item_id -> quantity; every row moves in one statement or none do
+    demands = {item_id: quantity for item_id, quantity in demands.items() if quantity > 0}
+    if not demands:
+        return
+    condition = Q()
+    for item_id, quantity in demands.items():
+        condition |= _enough(item_id, quantity, terminal)
+    with transaction.atomic():
+        updated = InventoryItem.objects.filter(condition).update(
+            quantity=Case(
+                *[When(pk=item_id, then=F('quantity') - quantity) for item_id, quantity in demands.items()],
+                output_field=IntegerField(),
+            )
+        )
+        if updated == len(demands):
+            ledger.record_many({item_id: -quantity for item_id, quantity in demands.items()}, reason, reference)
+            changes.record(InventoryItem, demands)
+            holds.consume(terminal, demands)
+            cache.invalidate()
+            alerts.check(demands)
+            return
+        transaction.set_rollback(True)
+
+    if terminal is None:
+        available = dict(InventoryItem.objects.filter(pk__in=demands).values_list('pk', 'quantity'))
+    else:
+        available = holds.availability(demands, terminal)
+    for item_id, quantity in demands.items():
+        if available.get(item_id, 0) < quantity:
+            logger.info(f"Stock decrement refused for item {item_id}: requested {quantity}")
+            raise InsufficientStock(item_id, quantity, available.get(item_id, 0))
+    # Stock was restored between the two statements; refuse rather than loop
+    item_id, quantity = next(iter(demands.items()))
+    raise InsufficientStock(item_id, quantity, available.get(item_id, 0))
+
+
+def give_back(item_id, quantity, reason='SALE_VOID', reference=''):
+    if quantity <= 0:
+        return
+    if InventoryItem.objects.filter(pk=item_id).update(quantity=F('quantity') + quantity):
+        ledger.record(item_id, quantity, reason, reference)
+        changes.record(InventoryItem, [item_id])
+    cache.invalidate()
+
+
+def _sale_reference(sale_id):
+    return f'sale:{sale_id}' if sale_id else ''
+
+
+def apply_sale(item_id, quantity, sale_id=None, terminal=None):
+    take(item_id, quantity, 'SALE', _sale_reference(sale_id), terminal)
+
+
+def revert_sale(item_id, quantity, sale_id=None):
+    give_back(item_id, quantity, 'SALE_VOID', _sale_reference(sale_id))
+
+
+def apply_sale_edit(old_item_id, old_quantity, new_item_id, new_quantity, sale_id=None, terminal=None):
+    reference = _sale_reference(sale_id)
+    if old_item_id == new_item_id:
+        difference = new_quantity - old_quantity
+        if difference > 0:
+            take(new_item_id, difference, 'SALE_EDIT', reference, terminal)
+        elif difference < 0:
+            give_back(new_item_id, -difference, 'SALE_EDIT', reference)
+        return
+    give_back(old_item_id, old_quantity, 'SALE_EDIT', reference)
+    take(new_item_id, new_quantity, 'SALE_EDIT', reference, terminal)
+
+
+def shortfall(item, quantity, sale=None, terminal=None):
+    # Pre-check against the already loaded row; the UPDATE above is authoritative
+    own = sale.quantity if sale is not None and sale.item_id == item.pk else 0
+    held = holds.held_quantity(item.pk, terminal) if terminal is not None else 0
+    return max(quantity - own - (item.quantity - held), 0)
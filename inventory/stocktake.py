@@ -0,0 +1,86 @@
+import logging
+from collections import Counter
+from django.db import transaction
+from django.db.models import F
+from .models import InventoryItem
+from .serializers import StockCountSerializer
+from sync import changes
+from . import alerts, cache, ledger
+
+logger = logging.getLogger(__name__)
+
+
+class StockTakeError(Exception):
+    def __init__(self, detail):
+        self.detail = detail
+        super().__init__(detail)
+
+
+def apply_counts(entries, user=None):
+    """Apply a stock count of {id, quantity} or {id, delta} entries in one transaction.
+
+    Returns one variance row per entry, measured against the quantity on
+    record when the count was applied.
+    """
+    serializer = StockCountSerializer(data=entries, many=True)
+    if not serializer.is_valid():
+        raise StockTakeError({"errors": serializer.errors})
+    entries = serializer.validated_data
+    if not entries:
+        raise StockTakeError({"error": "No counts provided"})
+
+    ids = [entry['id'] for entry in entries]
+    duplicates = sorted(item_id for item_id, seen in Counter(ids).items() if seen > 1)
+    if duplicates:
+        raise StockTakeError({"error": "Duplicate items in stock take", "ids": duplicates})
+
+    with transaction.atomic():
+        # Take the write lock before reading, so expected is the quantity the
+        # update lands on; select_for_update is a no-op on SQLite
+        InventoryItem.objects.filter(pk__in=ids).update(quantity=F('quantity'))
+        items = InventoryItem.objects.select_for_update().filter(is_deleted=False).in_bulk(ids)
+        missing = [item_id for item_id in ids if item_id not in items]
+        if missing:
+            raise StockTakeError({"error": "Items not found", "ids": missing})
+
+        changed = []
+        movements = {}
+        variances = []
+        errors = []
+        for entry in entries:
+            item = items[entry['id']]
+            expected = item.quantity
+            if 'delta' in entry:
+                counted = expected + entry['delta']
+                # Relative to the stored value, so a concurrent sale is not lost
+                item.quantity = F('quantity') + entry['delta']
+            else:
+                counted = entry['quantity']
+                item.quantity = counted
+            if counted < 0:
+                errors.append({"id": item.pk, "error": f"Count for {item.name} would leave {counted} in stock"})
+                continue
+            variances.append({
+                "id": item.pk,
+                "name": item.name,
+                "expected": expected,
+                "counted": counted,
+                "variance": counted - expected,
+            })
+            if counted != expected:
+                changed.append(item)
+                # A delta entry ledgers the delta it applied, not a difference of reads
+                movements[item.pk] = entry.get('delta', counted - expected)
+
+        if errors:
+            raise StockTakeError({"errors": errors})
+        if changed:
+            # bulk_update skips post_save, so the cache and alerts are told here
+            InventoryItem.objects.bulk_update(changed, ['quantity'])
+            ledger.record_many(movements, 'STOCK_TAKE')
+            changes.record(InventoryItem, [item.pk for item in changed])
+            cache.invalidate()
+            alerts.check([item.pk for item in changed])
+
+    logger.info(f"Stock take by {user}: {len(entries)} items counted, {len(changed)} adjusted")
+    return variances
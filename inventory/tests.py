@@ -1,3 +1,371 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from barMan_backend.query_budget import QueryBudgetMixin
+from customers.models import Customer, CustomerTab
+from sales.models import Sale
+from . import alerts, holds, ledger, purge, stock
+from .models import InventoryItem, InventoryMovement, StockHold
+from .stocktake import apply_counts
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(LOW_STOCK_ALERTS_ASYNC=False)
+class InventoryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.item = InventoryItem.objects.create(name='Beer', cost=Decimal('2.50'), quantity=10)
+
+
+class ETagTests(InventoryTestCase):
+    url = '/api/inventory/inventoryitems/'
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_write_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_revoked_token_is_refused_not_answered_with_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 401)
+
+    def test_anonymous_request_is_refused_not_answered_with_304(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(APIClient().get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 401)
+
+
+class ListCacheTests(InventoryTestCase):
+    url = '/api/inventory/inventoryitems/'
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def quantities(self, **params):
+        return {row['name']: row['quantity'] for row in self.client.get(self.url, params).data['results']}
+
+    def test_repeat_request_is_served_without_queries(self):
+        self.quantities()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.quantities(), {'Beer': 10})
+
+    def test_stock_movement_from_a_sale_invalidates_the_cache(self):
+        self.quantities()
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.take(self.item.pk, 3)
+        self.assertEqual(self.quantities(), {'Beer': 7})
+
+    def test_edit_and_create_invalidate_the_cache(self):
+        self.quantities()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.quantity = 4
+            self.item.save()
+            InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=2)
+        self.assertEqual(self.quantities(), {'Beer': 4, 'Gin': 2})
+
+    def test_query_params_are_cached_separately(self):
+        InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=2)
+        self.assertEqual(self.quantities(search='Gin'), {'Gin': 2})
+        self.assertEqual(self.quantities(search='Beer'), {'Beer': 10})
+
+
+class LowStockAlertTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        alerts._last_alerted.clear()
+        self.gin = InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=5, low_inventory_threshold=2)
+        patcher = mock.patch.object(alerts, 'send_alert')
+        self.send_alert = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def take(self, item, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.take(item.pk, quantity)
+
+    def alerted(self):
+        ids = [call.args[0] for call in self.send_alert.call_args_list]
+        self.send_alert.reset_mock()
+        return ids
+
+    def test_sale_that_crosses_the_threshold_alerts_once(self):
+        self.take(self.gin, 2)
+        self.assertEqual(self.alerted(), [])
+        self.take(self.gin, 1)
+        self.assertEqual(self.alerted(), [self.gin.pk])
+        self.take(self.gin, 1)
+        self.assertEqual(self.alerted(), [])
+
+    def test_restocked_item_alerts_again_when_it_drops(self):
+        self.take(self.gin, 4)
+        self.assertEqual(self.alerted(), [self.gin.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gin.quantity = 10
+            self.gin.save()
+        self.take(self.gin, 9)
+        self.assertEqual(self.alerted(), [self.gin.pk])
+
+    def test_worker_batches_collapse_duplicates(self):
+        for item_id in (self.gin.pk, self.item.pk, self.gin.pk):
+            alerts._pending.put(item_id)
+        with override_settings(LOW_STOCK_ALERT_WINDOW=0.1):
+            self.assertEqual(alerts._next_batch(), {self.gin.pk, self.item.pk})
+        while not alerts._pending.empty():
+            alerts._pending.get_nowait()
+
+    def test_low_stock_endpoint_lists_low_items_that_are_not_deleted(self):
+        self.take(self.gin, 3)
+        InventoryItem.objects.create(name='Rum', cost=Decimal('4.00'), quantity=0, is_deleted=True)
+        response = self.client.get('/api/inventory/inventoryitems/low_stock/')
+        self.assertEqual([row['name'] for row in response.data['results']], ['Beer', 'Gin'])
+
+    def test_low_stock_query_uses_the_partial_index(self):
+        sql, params = alerts.low_stock().order_by('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('inventory_low_stock_idx', plan)
+
+
+class StockHoldTests(InventoryTestCase):
+    url = '/api/inventory/inventoryitems/holds/'
+
+    def hold(self, terminal, quantity, item=None):
+        items = [{'id': (item or self.item).pk, 'quantity': quantity}]
+        return self.client.post(self.url, {'items': items}, format='json', HTTP_X_TERMINAL_ID=terminal)
+
+    def sell(self, terminal, quantity):
+        data = {'item': self.item.pk, 'quantity': quantity}
+        return self.client.post('/api/sales/', data, format='json', HTTP_X_TERMINAL_ID=terminal)
+
+    def test_other_terminals_cannot_sell_held_stock(self):
+        self.assertEqual(self.hold('bar-1', 8).status_code, 200)
+        self.assertEqual(self.sell('bar-2', 3).status_code, 400)
+        self.assertEqual(self.sell('bar-2', 2).status_code, 201)
+        self.assertEqual(self.sell('bar-1', 8).status_code, 201)
+        self.assertFalse(StockHold.objects.exists())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 0)
+
+    def test_hold_beyond_unheld_stock_changes_nothing(self):
+        gin = InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=5)
+        self.hold('bar-1', 6)
+        items = [{'id': gin.pk, 'quantity': 1}, {'id': self.item.pk, 'quantity': 5}]
+        response = self.client.post(self.url, {'items': items}, format='json', HTTP_X_TERMINAL_ID='bar-2')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['shortages'], [{'id': self.item.pk, 'requested': 5, 'available': 4}])
+        self.assertFalse(StockHold.objects.filter(terminal='bar-2').exists())
+
+    def test_availability_excludes_only_other_terminals_holds(self):
+        self.hold('bar-1', 6)
+        url = f'/api/inventory/inventoryitems/availability/?items={self.item.pk}'
+        self.assertEqual(self.client.get(url, HTTP_X_TERMINAL_ID='bar-1').data['results'][0]['available'], 10)
+        self.assertEqual(self.client.get(url, HTTP_X_TERMINAL_ID='bar-2').data['results'][0]['available'], 4)
+
+    def test_expired_holds_count_for_nothing_and_are_swept(self):
+        holds.place('bar-1', {self.item.pk: 10}, now=timezone.now() - holds.ttl() - timedelta(seconds=1))
+        self.assertEqual(self.sell('bar-2', 10).status_code, 201)
+        self.assertEqual(holds.sweep(), 1)
+
+    def test_delete_releases_the_terminals_holds(self):
+        self.hold('bar-1', 6)
+        response = self.client.delete(self.url, HTTP_X_TERMINAL_ID='bar-1')
+        self.assertEqual(response.data, {'released': 1})
+        self.assertEqual(self.sell('bar-2', 10).status_code, 201)
+
+
+class PurgeTests(InventoryTestCase):
+    def test_purge_removes_the_items_sales_and_their_pending_tab_amounts(self):
+        customer = Customer.objects.create(name='Bob', phone_number='08030000000', tab_limit=Decimal('100.00'))
+        items = [InventoryItem.objects.create(name=f'Item {i}', cost=Decimal('1.00'), quantity=50) for i in range(3)]
+        for item in items + [self.item]:
+            rows = [
+                {'item': item.pk, 'quantity': 2, 'customer': customer.pk},
+                {'item': item.pk, 'quantity': 1, 'payment_status': 'DONE'},
+            ]
+            self.assertEqual(self.client.post('/api/sales/multiple/', rows, format='json').status_code, 201)
+        old = timezone.now() - purge.grace_period() - timedelta(days=1)
+        InventoryItem.objects.filter(pk__in=[item.pk for item in items]).update(is_deleted=True, delete_requested_at=old)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            results = list(purge.sweep(batch_size=2))
+        self.assertEqual(results, [(2, 4), (1, 2)])
+        self.assertEqual(list(InventoryItem.objects.values_list('pk', flat=True)), [self.item.pk])
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(CustomerTab.objects.get(customer=customer).amount, Decimal('5.00'))
+
+    def test_sales_are_deleted_in_batches(self):
+        items = [InventoryItem.objects.create(name=f'Item {i}', cost=Decimal('1.00'), quantity=5) for i in range(5)]
+        Sale.objects.bulk_create([Sale(item=item, quantity=1, total_amount=Decimal('1.00')) for item in items])
+        with self.assertNumQueries(3):
+            deleted = purge._delete_sales(Sale, [item.pk for item in items], batch_size=2)
+        self.assertEqual(deleted, 5)
+        self.assertFalse(Sale.objects.exists())
+
+
+class LedgerTests(InventoryTestCase):
+    def ledger_total(self):
+        return InventoryMovement.objects.filter(item=self.item).aggregate(total=Sum('change'))['total']
+
+    def test_edit_of_a_stale_instance_ledgers_the_change_from_the_stored_quantity(self):
+        stale = InventoryItem.objects.get(pk=self.item.pk)
+        stock.take(self.item.pk, 3)
+        stale.quantity = 20
+        stale.save()
+        self.assertEqual(
+            list(InventoryMovement.objects.filter(item=self.item).values_list('reason', 'change')),
+            [('INITIAL', 10), ('SALE', -3), ('ADJUSTMENT', 13)],
+        )
+        self.assertEqual(self.ledger_total(), 20)
+
+    def test_saves_without_quantity_record_nothing(self):
+        self.item.name = 'Lager'
+        self.item.save(update_fields=['name'])
+        self.item.soft_delete()
+        self.assertEqual(InventoryMovement.objects.filter(item=self.item).count(), 1)
+
+    def test_stock_take_ledgers_the_change_it_applied(self):
+        gin = InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=4)
+        stock.take(self.item.pk, 2)
+        variances = apply_counts([{'id': self.item.pk, 'quantity': 5}, {'id': gin.pk, 'delta': -1}])
+        self.assertEqual([row['variance'] for row in variances], [-3, -1])
+        self.item.refresh_from_db()
+        gin.refresh_from_db()
+        self.assertEqual((self.item.quantity, gin.quantity), (5, 3))
+        self.assertEqual(self.ledger_total(), 5)
+        self.assertEqual(InventoryMovement.objects.filter(item=gin).aggregate(total=Sum('change'))['total'], 3)
+
+    def test_quantity_at_a_past_time_uses_the_snapshot_and_later_movements(self):
+        before = timezone.now()
+        self.assertEqual(ledger.take_snapshots(), 1)
+        stock.take(self.item.pk, 4)
+        # Nothing moved since the last snapshot for the other items
+        self.assertEqual(ledger.take_snapshots(), 1)
+        self.assertEqual(ledger.take_snapshots(), 0)
+        stock.take(self.item.pk, 1)
+        self.assertEqual(ledger.quantities_at(before, [self.item.pk]), {self.item.pk: 10})
+        self.assertEqual(ledger.quantities_at(timezone.now(), [self.item.pk]), {self.item.pk: 5})
+
+    def test_stock_at_endpoint_reads_between_snapshots(self):
+        self.client.force_authenticate(self.user)
+        gin = InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=4)
+        opened = timezone.now()
+        stock.take(self.item.pk, 2)
+        call_command('snapshot_inventory', stdout=StringIO())
+        middle = timezone.now()
+        stock.take(self.item.pk, 3)
+        stock.take(gin.pk, 1)
+        call_command('snapshot_inventory', stdout=StringIO())
+
+        def quantities(when):
+            response = self.client.get('/api/inventory/inventoryitems/stock-at/', {'at': when.isoformat()})
+            self.assertEqual(response.status_code, 200, response.data)
+            return {row['name']: row['quantity'] for row in response.data['results']}
+
+        self.assertEqual(quantities(opened), {'Beer': 10, 'Gin': 4})
+        self.assertEqual(quantities(middle), {'Beer': 8, 'Gin': 4})
+        self.assertEqual(quantities(timezone.now()), {'Beer': 5, 'Gin': 3})
+        response = self.client.get('/api/inventory/inventoryitems/stock-at/', {'at': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class StockTakeTests(InventoryTestCase):
+    url = '/api/inventory/inventoryitems/stock-take/'
+
+    def setUp(self):
+        super().setUp()
+        self.user.can_update_inventory = True
+        self.user.save()
+        self.gin = InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=4)
+
+    def count(self, counts, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(self.url, {'counts': counts}, format='json', **headers)
+
+    def quantities(self):
+        return tuple(InventoryItem.objects.filter(pk__in=[self.item.pk, self.gin.pk]).order_by('pk').values_list('quantity', flat=True))
+
+    def test_reports_each_rows_variance_for_a_mix_of_quantities_and_deltas(self):
+        response = self.count([{'id': self.item.pk, 'quantity': 7}, {'id': self.gin.pk, 'delta': 2}])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['results'], [
+            {'id': self.item.pk, 'name': 'Beer', 'expected': 10, 'counted': 7, 'variance': -3},
+            {'id': self.gin.pk, 'name': 'Gin', 'expected': 4, 'counted': 6, 'variance': 2},
+        ])
+        self.assertEqual(response.data['total_variance'], -1)
+        self.assertEqual(self.quantities(), (7, 6))
+
+    def test_duplicate_ids_are_refused(self):
+        response = self.count([{'id': self.item.pk, 'quantity': 7}, {'id': self.item.pk, 'delta': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ids'], [self.item.pk])
+        self.assertEqual(self.quantities(), (10, 4))
+
+    def test_missing_or_deleted_ids_are_refused(self):
+        self.gin.soft_delete()
+        response = self.count([{'id': self.item.pk, 'quantity': 7}, {'id': self.gin.pk, 'quantity': 1}, {'id': 999999, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ids'], [self.gin.pk, 999999])
+        self.assertEqual(self.quantities(), (10, 4))
+
+    def test_an_empty_count_is_refused(self):
+        response = self.count([])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'No counts provided'})
+
+    def test_a_delta_below_zero_refuses_the_whole_count(self):
+        response = self.count([{'id': self.item.pk, 'quantity': 7}, {'id': self.gin.pk, 'delta': -5}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['id'] for error in response.data['errors']], [self.gin.pk])
+        self.assertEqual(self.quantities(), (10, 4))
+        self.assertFalse(InventoryMovement.objects.filter(reason='STOCK_TAKE').exists())
+
+    def test_a_replayed_delta_count_is_applied_once(self):
+        counts = [{'id': self.gin.pk, 'delta': -1}]
+        first = self.count(counts, key='count-1')
+        retry = self.count(counts, key='count-1')
+        self.assertEqual(first.status_code, 200, first.data)
+        self.assertEqual((retry.status_code, retry.data), (200, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.quantities(), (10, 3))
+        self.assertEqual(InventoryMovement.objects.filter(item=self.gin, reason='STOCK_TAKE').count(), 1)
+
+
+class QueryBudgetTests(QueryBudgetMixin, InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        # The first token lookup misses the auth cache; keep it out of the counts
+        self.client.force_authenticate(self.user)
+        InventoryItem.objects.bulk_create(
+            [InventoryItem(name=f'Item {i}', cost=Decimal('1.00'), quantity=i % 3) for i in range(60)]
+        )
+
+    def test_item_list(self):
+        self.assertQueryCountFlat(self.client, '/api/inventory/inventoryitems/')
+
+    def test_low_stock_list(self):
+        self.assertQueryCountFlat(self.client, '/api/inventory/inventoryitems/low_stock/')
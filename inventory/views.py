@@ -3,74 +3,170 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import InventoryItem
-from .serializers import InventoryItemSerializer, InventoryItemUpdateSerializer
+from .serializers import InventoryItemSerializer, InventoryItemUpdateSerializer, StockHoldSerializer, HoldRequestSerializer
 from .permissions import CanUpdateInventory
-from rest_framework.authentication import TokenAuthentication
+from . import cache as inventory_cache
+from . import alerts, holds, ledger, purge
+from .stocktake import apply_counts, StockTakeError
+from sales.idempotency import idempotent
+from users.authentication import CachedTokenAuthentication
+from barMan_backend.log_filters import DebugSampler
+from barMan_backend.etags import VersionedETagMixin
 from rest_framework.throttling import UserRateThrottle
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_datetime
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 
 logger = logging.getLogger(__name__)
+log_sample = DebugSampler(logger)
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
-class InventoryItemViewSet(viewsets.ModelViewSet):
+class InventoryItemViewSet(VersionedETagMixin, viewsets.ModelViewSet):
     throttle_classes = [UserRateThrottle]
     throttle_scope = 'inventory'
     queryset = InventoryItem.objects.all().order_by('id')
     serializer_class = InventoryItemSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['name', 'cost']
     search_fields = ['name']
     ordering_fields = ['name', 'cost', 'quantity']
+    etag_actions = ('low_stock',)
 
     def get_permissions(self):
-        logger.info(f"Getting permissions for action: {self.action}")
-        logger.info(f"User: {self.request.user}, Authenticated: {self.request.user.is_authenticated}")
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'update_quantity', 'soft_delete', 'confirm_delete', 'restore']:
-            logger.info("Applying CanUpdateInventory permission")
-            return [CanUpdateInventory()]
-        logger.info("Applying IsAuthenticated permission")
-        return [permissions.IsAuthenticated()]
-
-    def initial(self, request, *args, **kwargs):
-        logger.info(f"Initial method called for action: {self.action}")
-        logger.info(f"User: {request.user}, Authenticated: {request.user.is_authenticated}")
-        logger.info(f"Request headers: {request.headers}")
-        super().initial(request, *args, **kwargs)
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'update_quantity', 'stock_take', 'soft_delete', 'confirm_delete', 'restore']:
+            permission_classes = [CanUpdateInventory]
+        else:
+            permission_classes = [permissions.IsAuthenticated]
+        if log_sample():
+            logger.debug(f"Action: {self.action}, User: {self.request.user}, Permission classes: {[p.__name__ for p in permission_classes]}")
+        return [permission() for permission in permission_classes]
 
     @action(detail=True, methods=['patch'])
     def update_quantity(self, request, pk=None):
         item = self.get_object()
         serializer = InventoryItemUpdateSerializer(item, data=request.data, partial=True)
         if serializer.is_valid():
+            # Threshold checks run on the alert worker via the post_save hook
             serializer.save()
-            if item.quantity <= item.low_inventory_threshold:
-                # Send notification logic here
-                logger.warning(f"Low inventory alert for item: {item.name}")
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @method_decorator(cache_page(60 * 15))  # Cache for 15 minutes
+    @action(detail=False, methods=['post'], url_path='stock-take')
+    @idempotent
+    def stock_take(self, request):
+        # One request for a whole count instead of one update_quantity per item
+        entries = request.data.get('counts') if isinstance(request.data, dict) else request.data
+        try:
+            variances = apply_counts(entries, request.user)
+        except StockTakeError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "results": variances,
+            "total_variance": sum(row['variance'] for row in variances),
+        })
+
+    @action(detail=False, methods=['get', 'post', 'delete'], url_path='holds')
+    def stock_holds(self, request):
+        # Stock this terminal has set aside for an open round; POST replaces
+        # the listed items' holds and restarts their expiry
+        terminal = holds.terminal_id(request)
+        if request.method == 'DELETE':
+            released = holds.release(terminal)
+            return Response({"released": released})
+        if request.method == 'POST':
+            entries = request.data.get('items') if isinstance(request.data, dict) else request.data
+            serializer = HoldRequestSerializer(data=entries, many=True)
+            if not serializer.is_valid():
+                return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+            requested = {}
+            for entry in serializer.validated_data:
+                requested[entry['id']] = requested.get(entry['id'], 0) + entry['quantity']
+            try:
+                active = holds.place(terminal, requested)
+            except holds.HoldUnavailable as e:
+                return Response({
+                    "error": "Not enough stock to hold",
+                    "shortages": [
+                        {"id": item_id, "requested": requested_quantity, "available": available}
+                        for item_id, (requested_quantity, available) in sorted(e.shortages.items())
+                    ],
+                }, status=status.HTTP_409_CONFLICT)
+        else:
+            active = holds.active().filter(terminal=terminal).order_by('item_id')
+        return Response({"terminal": terminal, "holds": StockHoldSerializer(active, many=True).data})
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        # quantity less other terminals' active holds, for ?items=1,2,3
+        try:
+            item_ids = [int(item_id) for item_id in request.query_params.get('items', '').split(',') if item_id]
+        except ValueError:
+            return Response({"error": "items must be a comma separated list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+        available = holds.availability(item_ids, holds.terminal_id(request))
+        return Response({"results": [{"id": item_id, "available": max(quantity, 0)} for item_id, quantity in sorted(available.items())]})
+
+    @action(detail=False, methods=['get'], url_path='stock-at')
+    def stock_at(self, request):
+        # Shelf quantities at ?at=<datetime>, from the nearest snapshot plus later movements
+        at = parse_datetime(request.query_params.get('at', ''))
+        if at is None:
+            return Response({"error": "at must be an ISO 8601 datetime"}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        items = InventoryItem.objects.order_by('id')
+        if request.query_params.get('items'):
+            try:
+                items = items.filter(pk__in=[int(item_id) for item_id in request.query_params['items'].split(',')])
+            except ValueError:
+                return Response({"error": "items must be a comma separated list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rows = ledger.annotate_quantity_at(items, at).values('id', 'name', 'quantity_at')
+            return Response({
+                "at": at,
+                "results": [{"id": row['id'], "name": row['name'], "quantity": row['quantity_at']} for row in rows],
+            })
+        except Exception as e:
+            logger.error(f"Error in stock_at method: {str(e)}", exc_info=True)
+            return Response({"error": "An unexpected error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['get'])
+    def low_stock(self, request):
+        try:
+            queryset = alerts.low_stock().order_by('id')
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+        except Exception as e:
+            logger.error(f"Error in low_stock method: {str(e)}", exc_info=True)
+            return Response({"error": "An unexpected error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     def list(self, request, *args, **kwargs):
         try:
             logger.info(f"Listing inventory items for user: {request.user}")
-            logger.info(f"User permissions: {request.user.get_all_permissions()}")
+            # Keyed on a generation counter that every InventoryItem write
+            # (including stock movements from sales) bumps, so hits are never stale
+            cache_key = inventory_cache.list_cache_key(request)
+            data = inventory_cache.get_list(cache_key)
+            if data is not None:
+                logger.debug(f"Inventory list served from cache: {cache_key}")
+                return Response(data)
             response = super().list(request, *args, **kwargs)
+            inventory_cache.set_list(cache_key, response.data)
             logger.debug(f"Response data: {response.data}")
             return response
         except Exception as e:
@@ -125,9 +221,8 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         try:
             item = self.get_object()
             if item.is_deleted and item.delete_requested_at:
-                grace_period = timezone.now() - timedelta(days=30)  # 30-day grace period
-                if item.delete_requested_at <= grace_period:
-                    item.delete()
+                if item.delete_requested_at <= timezone.now() - purge.grace_period():
+                    purge.purge_items([item.pk])
                     logger.info(f"Permanently deleted inventory item: {item.name}")
                     return Response({"status": "Item permanently deleted"}, status=status.HTTP_204_NO_CONTENT)
                 else:
@@ -198,15 +293,6 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
             return Response({"error": "You don't have permission to perform this action"}, status=status.HTTP_403_FORBIDDEN)
         return super().handle_exception(exc)
 
-    def list(self, request, *args, **kwargs):
-        logger.info(f"Listing inventory items for user: {request.user}")
-
-        # Log large payloads
-        if len(request.body) > 1000:
-            logger.warning(f"Large payload detected: {len(request.body)} bytes")
-
-        return super().list(request, *args, **kwargs)
-
     @action(detail=True, methods=['post'])
     def soft_delete(self, request, pk=None):
         try:
@@ -1,8 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate, post_migrate
 
 class SalesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sales'
 
     def ready(self):
-        import sales.signals  # This line imports the signals
\ No newline at end of file
+        import sales.signals  # This line imports the signals
+        pre_migrate.connect(sales.signals.drop_search_triggers, sender=self)
+        post_migrate.connect(sales.signals.install_search_index, sender=self)
@@ -0,0 +1,103 @@
+import logging
+from decimal import Decimal
+from django.db import transaction
+from inventory import holds, stock
+from inventory.models import InventoryItem
+from customers.models import Customer, CustomerTab
+from .models import Sale
+from . import rollups
+from .serializers import SaleRowSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class BulkSaleError(Exception):
+    def __init__(self, detail):
+        self.detail = detail
+        super().__init__(detail)
+
+
+def _insufficient(item, requested, available):
+    # Same body the per-row SaleSerializer validation has always returned
+    logger.info(f"Insufficient inventory for {item.name}. Available: {available}, Requested: {requested}")
+    return BulkSaleError({"non_field_errors": ["Not enough inventory"]})
+
+
+def create_sales(rows, user, terminal=None):
+    serializer = SaleRowSerializer(data=rows, many=True)
+    if not serializer.is_valid():
+        errors = serializer.errors
+        if isinstance(errors, list):
+            errors = next(error for error in errors if error)
+        raise BulkSaleError(errors)
+    rows = serializer.validated_data
+
+    # One query each for every referenced item and customer
+    items = InventoryItem.objects.in_bulk({row['item'] for row in rows})
+    customer_ids = {row['customer'] for row in rows if row.get('customer')}
+    customers = Customer.objects.select_related('tab').in_bulk(customer_ids) if customer_ids else {}
+
+    sales = []
+    demands = {}
+    tab_deltas = {}
+    for row in rows:
+        item = items.get(row['item'])
+        if item is None:
+            raise BulkSaleError({"item": [f'Invalid pk "{row["item"]}" - object does not exist.']})
+        customer = None
+        if row.get('customer'):
+            customer = customers.get(row['customer'])
+            if customer is None:
+                raise BulkSaleError({"customer": [f'Invalid pk "{row["customer"]}" - object does not exist.']})
+
+        sale = Sale(
+            item=item,
+            quantity=row['quantity'],
+            payment_status=row['payment_status'],
+            customer=customer,
+            recorded_by=user,
+            total_amount=item.cost * row['quantity'],
+        )
+        sales.append(sale)
+        demands[item.pk] = demands.get(item.pk, 0) + sale.quantity
+        entry = sale.tab_entry()
+        if entry:
+            tab_deltas[entry[0]] = tab_deltas.get(entry[0], Decimal('0.00')) + entry[1]
+
+    # Check inventory once per item, less what other terminals hold
+    available = holds.availability(demands, terminal) if terminal is not None else {}
+    for item_id, requested in demands.items():
+        item = items[item_id]
+        in_stock = available.get(item_id, item.quantity)
+        if in_stock < requested:
+            raise _insufficient(item, requested, in_stock)
+
+    # Check tab limit once per customer
+    tabs = {}
+    for customer_id, delta in tab_deltas.items():
+        customer = customers[customer_id]
+        tab = getattr(customer, 'tab', None)
+        tabs[customer_id] = tab
+        available_credit = tab.available_credit if tab else customer.tab_limit
+        new_tab_amount = customer.tab_limit - available_credit + delta
+        if delta > available_credit:
+            raise BulkSaleError({
+                "error": "Tab limit exceeded",
+                "customer_name": customer.name,
+                "customer_id": customer.id,
+                "current_limit": customer.tab_limit,
+                "required_limit": new_tab_amount
+            })
+
+    with transaction.atomic():
+        try:
+            stock.take_many(demands, terminal=terminal)
+        except stock.InsufficientStock as e:
+            raise _insufficient(items[e.item_id], e.requested, e.available)
+        # bulk_create skips the Sale signals, so tabs and rollups are moved here
+        Sale.objects.bulk_create(sales)
+        CustomerTab.apply_deltas_bulk(tab_deltas, tabs)
+        rollups.apply_entries(sale.rollup_entry() for sale in sales)
+
+    logger.info(f"Bulk created {len(sales)} sales across {len(demands)} items")
+    return sales
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24))
+
+
+def _lock_timeout():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+
+def _fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, cls=JSONEncoder, separators=(',', ':'))
+    return hashlib.sha256(f"{request.method} {request.path}\n{payload}".encode()).hexdigest()
+
+
+def _replay(record):
+    response = Response(json.loads(record.response_body) if record.response_body else None, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(request, key, fingerprint):
+    """Return (record, replay_response); exactly one of them is set."""
+    now = timezone.now()
+    record = IdempotencyRecord.objects.filter(user=request.user, key=key).first()
+    if record is not None and record.expires_at > now:
+        if record.fingerprint != fingerprint:
+            return None, Response(
+                {"error": "Idempotency-Key was already used for a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record.status_code is not None:
+            return None, _replay(record)
+        if record.created_at > now - _lock_timeout():
+            return None, Response(
+                {"error": "A request with this Idempotency-Key is still being processed"},
+                status=status.HTTP_409_CONFLICT
+            )
+    if record is not None:
+        # Expired, or abandoned mid-request: start over under the same key
+        record.delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyRecord.objects.create(
+                user=request.user, key=key, fingerprint=fingerprint, expires_at=now + _ttl()
+            )
+    except IntegrityError:
+        return None, Response(
+            {"error": "A request with this Idempotency-Key is still being processed"},
+            status=status.HTTP_409_CONFLICT
+        )
+    return record, None
+
+
+def idempotent(view_method):
+    """Honour an Idempotency-Key header on a POST view method.
+
+    The first request with a key runs the view and stores its status and body;
+    retries with the same key and payload get the stored response back.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": "Idempotency-Key is too long"}, status=status.HTTP_400_BAD_REQUEST)
+
+        record, replay = _claim(request, key, _fingerprint(request))
+        if replay is not None:
+            logger.info(f"Idempotency-Key {key} for user {request.user} answered without re-running the request")
+            return replay
+
+        try:
+            # The write and its stored response commit together, so a crash
+            # cannot leave a sale behind without a replayable record
+            with transaction.atomic():
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code < 500 and hasattr(response, 'data'):
+                    record.status_code = response.status_code
+                    record.response_body = json.dumps(response.data, cls=JSONEncoder, separators=(',', ':'))
+                    record.save(update_fields=['status_code', 'response_body'])
+                    return response
+        except Exception:
+            record.delete()
+            raise
+        # Let the client retry server errors
+        record.delete()
+        return response
+    return wrapper
@@ -0,0 +1,62 @@
+import json
+import logging
+from . import bulk
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _flush(chunk, user):
+    try:
+        sales = bulk.create_sales([row for _, row in chunk], user)
+    except bulk.BulkSaleError:
+        # Something in the chunk is bad; retry line by line to pin it down
+        for line_no, row in chunk:
+            try:
+                sale, = bulk.create_sales([row], user)
+            except bulk.BulkSaleError as e:
+                yield {'line': line_no, 'status': 'error', 'errors': e.detail}
+            else:
+                yield {'line': line_no, 'status': 'created', 'id': sale.pk}
+        return
+    for (line_no, _), sale in zip(chunk, sales):
+        yield {'line': line_no, 'status': 'created', 'id': sale.pk}
+
+
+def _flush_in_order(chunk, errors, user):
+    # Parse errors wait with the chunk so results come out in line order
+    results = list(_flush(chunk, user)) if chunk else []
+    return sorted(results + errors, key=lambda result: result['line'])
+
+
+def import_sales(lines, user, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import NDJSON sale lines, committing every chunk_size rows, and yield one result per line in order."""
+    chunk = []
+    errors = []
+    for line_no, raw in enumerate(lines, start=1):
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8', errors='replace')
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            errors.append({'line': line_no, 'status': 'error', 'errors': {'error': 'Invalid JSON'}})
+        else:
+            if isinstance(row, dict):
+                chunk.append((line_no, row))
+            else:
+                errors.append({'line': line_no, 'status': 'error', 'errors': {'error': 'Expected a JSON object'}})
+        if len(chunk) + len(errors) >= chunk_size:
+            yield from _flush_in_order(chunk, errors, user)
+            chunk = []
+            errors = []
+    if chunk or errors:
+        yield from _flush_in_order(chunk, errors, user)
+
+
+def to_ndjson(results):
+    for result in results:
+        yield json.dumps(result, default=str) + '\n'
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from sales import statements
+
+class Command(BaseCommand):
+    help = 'Write a CSV statement per customer with sales in a period or still pending, plus an index file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First day (YYYY-MM-DD), defaults to the start of this month')
+        parser.add_argument('--end', type=str, help='Last day (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--output', type=str, help='Directory to write to, defaults to STATEMENTS_DIR/<start>_<end>')
+        parser.add_argument('--workers', type=int, help='Processes rendering statements, defaults to STATEMENT_WORKERS')
+        parser.add_argument('--chunk-size', type=int, help='Sales fetched per round trip')
+        parser.add_argument('--batch-size', type=int, help='Customers handed to a worker at a time')
+
+    def handle(self, *args, **options):
+        default_start, default_end = statements.default_period()
+        start = parse_date(options['start']) if options['start'] else default_start
+        end = parse_date(options['end']) if options['end'] else default_end
+        if start is None or end is None or start > end:
+            raise CommandError('Invalid --start/--end range')
+
+        directory = options['output'] or statements.output_directory(start, end)
+        try:
+            entries = statements.generate(
+                start, end, directory,
+                workers=options['workers'], chunk_size=options['chunk_size'], batch_size=options['batch_size'],
+            )
+        except statements.StatementRunInProgress as e:
+            raise CommandError(str(e))
+        count = 0
+        for entry in entries:
+            count += 1
+            if count % 1000 == 0:
+                self.stdout.write(f'{count} statements written')
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} statements for {start} to {end} to {directory}'))
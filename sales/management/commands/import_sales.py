@@ -0,0 +1,40 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from sales.importer import import_sales, DEFAULT_CHUNK_SIZE
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Import an NDJSON backlog of sales, one JSON object per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='NDJSON file to import, or - for stdin')
+        parser.add_argument('--user', type=str, required=True, help='Username recorded against the imported sales')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Sales committed per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+
+        try:
+            stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {options["path"]}: {e}')
+        created = failed = 0
+        try:
+            results = import_sales(stream, user, chunk_size=max(options['chunk_size'], 1))
+            for result in results:
+                if result['status'] == 'created':
+                    created += 1
+                else:
+                    failed += 1
+                self.stdout.write(json.dumps(result, default=str))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {created} sales, {failed} lines failed'))
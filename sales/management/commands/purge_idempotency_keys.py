@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sales.models import IdempotencyRecord
+
+class Command(BaseCommand):
+    help = 'Delete expired idempotency records in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Records deleted per statement')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        now = timezone.now()
+        deleted = 0
+        while True:
+            batch = list(
+                IdempotencyRecord.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            deleted += IdempotencyRecord.objects.filter(pk__in=batch).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency records'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from sales import search
+
+class Command(BaseCommand):
+    help = 'Recreate the sales full-text search index and its triggers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to rebuild')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not search.is_supported(connection):
+            raise CommandError('The sales search index is only available on SQLite')
+        with transaction.atomic(using=options['database']):
+            search.install(connection)
+            search.rebuild(connection)
+        self.stdout.write(self.style.SUCCESS('Sales search index rebuilt'))
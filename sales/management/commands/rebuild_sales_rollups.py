@@ -0,0 +1,37 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from sales.models import Sale
+from sales import rollups
+
+class Command(BaseCommand):
+    help = 'Backfill or repair the daily sales rollups from the sales table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First day to rebuild (YYYY-MM-DD), defaults to the first sale')
+        parser.add_argument('--end', type=str, help='Last day to rebuild (YYYY-MM-DD), defaults to the last sale')
+        parser.add_argument('--days-per-chunk', type=int, default=31, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        bounds = Sale.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+        if bounds['first'] is None:
+            self.stdout.write('No sales to roll up')
+            return
+
+        start = parse_date(options['start']) if options['start'] else timezone.localdate(bounds['first'])
+        end = parse_date(options['end']) if options['end'] else timezone.localdate(bounds['last'])
+        if start is None or end is None or start > end:
+            raise CommandError('Invalid --start/--end range')
+
+        step = timedelta(days=max(options['days_per_chunk'], 1))
+        written = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + step - timedelta(days=1), end)
+            written += rollups.rebuild(chunk_start, chunk_end)
+            self.stdout.write(f'Rebuilt {chunk_start} to {chunk_end}')
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup rows for {start} to {end}'))
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:47
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    Sale = apps.get_model('sales', 'Sale')
+    SaleDailyRollup = apps.get_model('sales', 'SaleDailyRollup')
+    buckets = (
+        Sale.objects.annotate(day=TruncDate('timestamp'))
+        .values('day', 'payment_status', 'item_id', 'recorded_by_id')
+        .annotate(sale_count=models.Count('pk'), total_quantity=models.Sum('quantity'), total=models.Sum('total_amount'))
+        .order_by()
+    )
+    SaleDailyRollup.objects.bulk_create(
+        [
+            SaleDailyRollup(
+                day=bucket['day'],
+                payment_status=bucket['payment_status'],
+                item_id=bucket['item_id'],
+                recorded_by_id=bucket['recorded_by_id'],
+                sale_count=bucket['sale_count'],
+                quantity=bucket['total_quantity'],
+                total_amount=bucket['total'],
+            )
+            for bucket in buckets
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_inventoryitem_delete_requested_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sales', '0005_update_sale_total_amounts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('payment_status', models.CharField(choices=[('PENDING', 'Pending'), ('DONE', 'Done')], max_length=10)),
+                ('sale_count', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sale_rollups', to='inventory.inventoryitem')),
+                ('recorded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sale_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'payment_status'], name='sales_rollup_day_status_idx'), models.Index(fields=['day', 'item', 'recorded_by', 'payment_status'], name='sales_rollup_bucket_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0006_saledailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['-timestamp', '-id'], name='sales_sale_ts_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0008_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['customer', 'timestamp', 'id'], name='sales_sale_customer_ts_idx'),
+        ),
+    ]
@@ -1,9 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from django.utils import timezone
 from inventory.models import InventoryItem
-from customers.models import Customer, CustomerTab
+from customers.models import Customer
 from decimal import Decimal
 
 class Sale(models.Model):
@@ -19,38 +18,80 @@ class Sale(models.Model):
     recorded_by = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
 
+    class Meta:
+        indexes = [
+            # Keyset pagination walks this index newest first
+            models.Index(fields=['-timestamp', '-id'], name='sales_sale_ts_id_idx'),
+            # Statements stream each customer's sales in order off this index
+            models.Index(fields=['customer', 'timestamp', 'id'], name='sales_sale_customer_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.item.name} - {self.quantity} units"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this sale contributed to its customer's tab so the
+        # signal receivers can apply a delta instead of re-aggregating
+        if {'customer_id', 'payment_status', 'total_amount'}.issubset(field_names):
+            instance._loaded_tab_entry = instance.tab_entry()
+        if {'timestamp', 'payment_status', 'item_id', 'recorded_by_id', 'quantity', 'total_amount'}.issubset(field_names):
+            instance._loaded_rollup_entry = instance.rollup_entry()
+        return instance
+
+    def tab_entry(self):
+        if self.customer_id and self.payment_status == 'PENDING':
+            return (self.customer_id, self.total_amount)
+        return None
+
+    def rollup_entry(self):
+        # (bucket key, sale count, quantity, amount) for SaleDailyRollup
+        key = (timezone.localdate(self.timestamp), self.payment_status, self.item_id, self.recorded_by_id)
+        return (key, 1, self.quantity, self.total_amount)
+
     def save(self, *args, **kwargs):
         if not self.total_amount:
             self.total_amount = self.item.cost * self.quantity
-        super().save(*args, **kwargs)
-
-@receiver(post_save, sender=Sale)
-def update_inventory_and_tab_on_sale(sender, instance, created, **kwargs):
-    # Update inventory
-    inventory_item = instance.item
-    if created:
-        inventory_item.quantity -= instance.quantity
-    else:
-        original = Sale.objects.get(pk=instance.pk)
-        quantity_difference = instance.quantity - original.quantity
-        inventory_item.quantity -= quantity_difference
-    
-    inventory_item.save()
-
-    # Update customer tab
-    if instance.customer:
-        CustomerTab.update_tab_amount(instance.customer)
-
-@receiver(post_delete, sender=Sale)
-def update_inventory_and_tab_on_sale_delete(sender, instance, **kwargs):
-    # Update inventory
-    inventory_item = instance.item
-    inventory_item.quantity += instance.quantity
-    inventory_item.save()
-
-    # Update customer tab
-    if instance.customer:
-        CustomerTab.update_tab_amount(instance.customer)
\ No newline at end of file
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+class SaleDailyRollup(models.Model):
+    day = models.DateField()
+    payment_status = models.CharField(max_length=10, choices=Sale.PAYMENT_STATUS_CHOICES)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='sale_rollups')
+    recorded_by = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True, related_name='sale_rollups')
+    sale_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day', 'payment_status'], name='sales_rollup_day_status_idx'),
+            models.Index(fields=['day', 'item', 'recorded_by', 'payment_status'], name='sales_rollup_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.payment_status} item {self.item_id} - {self.total_amount}"
+
+class IdempotencyRecord(models.Model):
+    # Stored response for a POST made with an Idempotency-Key header
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='idempotency_records')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='sales_idempotency_user_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key} - {self.status_code}"
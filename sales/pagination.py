@@ -0,0 +1,111 @@
+import base64
+from collections import OrderedDict
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class SaleKeysetPagination(BasePagination):
+    """Cursor pagination over (timestamp, id), newest first.
+
+    Each page is an index range scan on the (timestamp, id) index, with no
+    OFFSET. The total is skipped unless ?count=exact or ?count=estimate asks
+    for it.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, sale, previous=False):
+        raw = f"{sale.timestamp.isoformat()}|{sale.pk}|{'p' if previous else 'n'}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            timestamp, pk, direction = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            timestamp = parse_datetime(timestamp)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor')
+        if timestamp is None or direction not in ('p', 'n'):
+            raise NotFound('Invalid cursor')
+        return timestamp, pk, direction == 'p'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.queryset = queryset
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.has_cursor = cursor is not None
+        self.reversed = False
+
+        ordered = queryset.order_by('-timestamp', '-id')
+        if cursor:
+            timestamp, pk, self.reversed = cursor
+            # The plain timestamp bound is what lets SQLite start the index
+            # scan at the cursor; the OR alone scans from the top of the index
+            if self.reversed:
+                ordered = queryset.filter(timestamp__gte=timestamp).filter(
+                    Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk)
+                ).order_by('timestamp', 'id')
+            else:
+                ordered = ordered.filter(timestamp__lte=timestamp).filter(
+                    Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk)
+                )
+
+        rows = list(ordered[:size + 1])
+        self.has_more = len(rows) > size
+        rows = rows[:size]
+        if self.reversed:
+            rows.reverse()
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        # Walking backwards, the page we came from is always ahead of us
+        if not self.page or not (self.has_more or self.reversed):
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.page or not self.has_cursor or (self.reversed and not self.has_more):
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[0], previous=True))
+
+    def get_count(self):
+        mode = self.request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return self.queryset.count(), False
+        if mode == 'estimate':
+            estimator = getattr(self.view, 'count_estimator', None)
+            estimate = estimator() if estimator else None
+            return estimate, estimate is not None
+        return None, False
+
+    def get_paginated_response(self, data):
+        count, estimated = self.get_count()
+        return Response(OrderedDict([
+            ('count', count),
+            ('count_estimated', estimated),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
@@ -1,5 +1,6 @@
 from rest_framework import permissions
+from users.permissions import has
 
 class IsSuperAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user and request.user.is_superuser
\ No newline at end of file
+        return has(request, 'is_superuser')
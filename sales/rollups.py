@@ -0,0 +1,156 @@
+import logging
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Sum, Count, Q, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Sale, SaleDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# Filters that map onto rollup columns; anything else has to be summed live
+ROLLUP_DIMENSIONS = ('payment_status', 'item', 'recorded_by')
+
+
+def apply_entries(entries):
+    # entries are signed (key, count, quantity, amount) tuples from Sale.rollup_entry
+    buckets = {}
+    for key, count, quantity, amount in entries:
+        bucket = buckets.setdefault(key, [0, 0, Decimal('0.00')])
+        bucket[0] += count
+        bucket[1] += quantity
+        bucket[2] += amount
+
+    for (day, payment_status, item_id, recorded_by_id), (count, quantity, amount) in buckets.items():
+        if not count and not quantity and not amount:
+            continue
+        bucket_rows = SaleDailyRollup.objects.filter(
+            day=day, payment_status=payment_status, item_id=item_id, recorded_by_id=recorded_by_id
+        )
+        updated = SaleDailyRollup.objects.filter(pk=Subquery(bucket_rows.values('pk')[:1])).update(
+            sale_count=F('sale_count') + count,
+            quantity=F('quantity') + quantity,
+            total_amount=F('total_amount') + amount,
+        )
+        if not updated:
+            SaleDailyRollup.objects.create(
+                day=day, payment_status=payment_status, item_id=item_id, recorded_by_id=recorded_by_id,
+                sale_count=count, quantity=quantity, total_amount=amount,
+            )
+
+
+def negate(entry):
+    key, count, quantity, amount = entry
+    return (key, -count, -quantity, -amount)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _totals(rows):
+    totals = {'DONE': Decimal('0.00'), 'PENDING': Decimal('0.00')}
+    for payment_status, total in rows:
+        totals[payment_status] = totals.get(payment_status, Decimal('0.00')) + (total or 0)
+    return totals
+
+
+def summarize(start=None, end=None, **dimensions):
+    """Sum sales per payment status between start and end.
+
+    Bounds are either dates (whole days, inclusive) or datetimes (instants,
+    inclusive). Whole days come from SaleDailyRollup; only the partial days at
+    the edges of a datetime range are summed from Sale.
+    """
+    lower = upper = None
+    upper_inclusive = True
+    if isinstance(start, datetime):
+        lower = start
+    elif isinstance(start, date):
+        lower = _day_start(start)
+    if isinstance(end, datetime):
+        upper = end
+    elif isinstance(end, date):
+        upper = _day_start(end + timedelta(days=1))
+        upper_inclusive = False
+
+    first_day = last_day = None
+    if lower is not None:
+        first_day = timezone.localdate(lower)
+        if lower != _day_start(first_day):
+            first_day += timedelta(days=1)
+    if upper is not None:
+        last_day = timezone.localdate(upper) - timedelta(days=1)
+
+    upper_q = Q(timestamp__lte=upper) if upper_inclusive else Q(timestamp__lt=upper)
+    if first_day is not None and last_day is not None and first_day > last_day:
+        # No whole day inside the range, so all of it is summed live
+        rollups = SaleDailyRollup.objects.none()
+        live = Q(timestamp__gte=lower) & upper_q
+    else:
+        rollups = SaleDailyRollup.objects.filter(**dimensions)
+        live = Q(pk__in=[])
+        if first_day is not None:
+            rollups = rollups.filter(day__gte=first_day)
+            live |= Q(timestamp__gte=lower, timestamp__lt=_day_start(first_day))
+        if last_day is not None:
+            rollups = rollups.filter(day__lte=last_day)
+            live |= Q(timestamp__gte=_day_start(last_day + timedelta(days=1))) & upper_q
+
+    totals = _totals(rollups.values_list('payment_status').annotate(total=Sum('total_amount')).order_by())
+    edge_totals = live_totals(Sale.objects.filter(live, **dimensions))
+    for payment_status, total in edge_totals.items():
+        totals[payment_status] = totals.get(payment_status, Decimal('0.00')) + total
+    return totals
+
+
+def estimate_count(start=None, end=None, **dimensions):
+    # Whole-day sale counts, so edge days are counted in full
+    rollups = SaleDailyRollup.objects.filter(**dimensions)
+    if start:
+        rollups = rollups.filter(day__gte=timezone.localdate(start) if isinstance(start, datetime) else start)
+    if end:
+        rollups = rollups.filter(day__lte=timezone.localdate(end) if isinstance(end, datetime) else end)
+    return rollups.aggregate(total=Sum('sale_count'))['total'] or 0
+
+
+def live_totals(queryset):
+    return _totals(queryset.values_list('payment_status').annotate(total=Sum('total_amount')).order_by())
+
+
+def rebuild(start=None, end=None):
+    """Recompute the rollups for the given days (inclusive) from Sale."""
+    sales = Sale.objects.annotate(day=TruncDate('timestamp'))
+    rollups = SaleDailyRollup.objects.all()
+    if start:
+        sales = sales.filter(day__gte=start)
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        sales = sales.filter(day__lte=end)
+        rollups = rollups.filter(day__lte=end)
+
+    buckets = (
+        sales.values('day', 'payment_status', 'item_id', 'recorded_by_id')
+        .annotate(sale_count=Count('pk'), total_quantity=Sum('quantity'), total=Sum('total_amount'))
+        .order_by()
+    )
+    with transaction.atomic():
+        deleted, _ = rollups.delete()
+        created = SaleDailyRollup.objects.bulk_create(
+            [
+                SaleDailyRollup(
+                    day=bucket['day'],
+                    payment_status=bucket['payment_status'],
+                    item_id=bucket['item_id'],
+                    recorded_by_id=bucket['recorded_by_id'],
+                    sale_count=bucket['sale_count'],
+                    quantity=bucket['total_quantity'],
+                    total_amount=bucket['total'],
+                )
+                for bucket in buckets
+            ],
+            batch_size=1000,
+        )
+    logger.info(f"Rebuilt sales rollups from {start} to {end}: {deleted} removed, {len(created)} written")
+    return len(created)
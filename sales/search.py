@@ -0,0 +1,149 @@
+import logging
+import re
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+# SQLite FTS5 shadow table over the denormalized names a sale is searched by.
+# rowid is the sale id; triggers keep it in step with sales and renames.
+TABLE = 'sales_sale_search'
+
+CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+    customer_name, item_name, recorded_by_username,
+    tokenize = 'unicode61', prefix = '2 3'
+)
+"""
+
+_NAMES = """
+    (SELECT name FROM customers_customer WHERE id = NEW.customer_id),
+    (SELECT name FROM inventory_inventoryitem WHERE id = NEW.item_id),
+    (SELECT username FROM users_customuser WHERE id = NEW.recorded_by_id)
+"""
+
+TRIGGERS = {
+    'sales_sale_search_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS sales_sale_search_insert AFTER INSERT ON sales_sale BEGIN
+            INSERT INTO {TABLE} (rowid, customer_name, item_name, recorded_by_username)
+            VALUES (NEW.id, {_NAMES});
+        END
+    """,
+    'sales_sale_search_update': f"""
+        CREATE TRIGGER IF NOT EXISTS sales_sale_search_update
+        AFTER UPDATE OF customer_id, item_id, recorded_by_id ON sales_sale BEGIN
+            DELETE FROM {TABLE} WHERE rowid = OLD.id;
+            INSERT INTO {TABLE} (rowid, customer_name, item_name, recorded_by_username)
+            VALUES (NEW.id, {_NAMES});
+        END
+    """,
+    'sales_sale_search_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS sales_sale_search_delete AFTER DELETE ON sales_sale BEGIN
+            DELETE FROM {TABLE} WHERE rowid = OLD.id;
+        END
+    """,
+    'sales_sale_search_customer_rename': f"""
+        CREATE TRIGGER IF NOT EXISTS sales_sale_search_customer_rename
+        AFTER UPDATE OF name ON customers_customer BEGIN
+            UPDATE {TABLE} SET customer_name = NEW.name
+            WHERE rowid IN (SELECT id FROM sales_sale WHERE customer_id = NEW.id);
+        END
+    """,
+    'sales_sale_search_item_rename': f"""
+        CREATE TRIGGER IF NOT EXISTS sales_sale_search_item_rename
+        AFTER UPDATE OF name ON inventory_inventoryitem BEGIN
+            UPDATE {TABLE} SET item_name = NEW.name
+            WHERE rowid IN (SELECT id FROM sales_sale WHERE item_id = NEW.id);
+        END
+    """,
+    'sales_sale_search_user_rename': f"""
+        CREATE TRIGGER IF NOT EXISTS sales_sale_search_user_rename
+        AFTER UPDATE OF username ON users_customuser BEGIN
+            UPDATE {TABLE} SET recorded_by_username = NEW.username
+            WHERE rowid IN (SELECT id FROM sales_sale WHERE recorded_by_id = NEW.id);
+        END
+    """,
+}
+
+REBUILD = f"""
+INSERT INTO {TABLE} (rowid, customer_name, item_name, recorded_by_username)
+SELECT s.id, c.name, i.name, u.username
+FROM sales_sale s
+LEFT JOIN customers_customer c ON c.id = s.customer_id
+LEFT JOIN inventory_inventoryitem i ON i.id = s.item_id
+LEFT JOIN users_customuser u ON u.id = s.recorded_by_id
+"""
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported(connection):
+    return connection.vendor == 'sqlite'
+
+
+def drop_triggers(connection):
+    # SQLite table rebuilds during migrations choke on triggers that point
+    # at the table being swapped out, so they are removed for the duration
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def _installed(connection):
+    names = [TABLE, *TRIGGERS]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def install(connection):
+    """Create the index table and triggers if missing; return whether anything was created."""
+    before = _installed(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+    return len(before) < len(TRIGGERS) + 1
+
+
+def rebuild(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(REBUILD)
+    logger.info("Rebuilt the sales search index")
+
+
+def _prefix_terms(text):
+    return ' AND '.join(f'"{token}"*' for token in TOKEN_RE.findall(text or ''))
+
+
+def match_expression(search_term, admin_term):
+    clauses = []
+    terms = _prefix_terms(search_term)
+    if terms:
+        clauses.append(f'{{customer_name item_name}} : ({terms})')
+    terms = _prefix_terms(admin_term)
+    if terms:
+        clauses.append(f'recorded_by_username : ({terms})')
+    return ' OR '.join(clauses)
+
+
+def filter_sales(queryset, search_term, admin_term):
+    """Restrict queryset to sales whose names prefix-match the search terms."""
+    if is_supported(connections[queryset.db]):
+        expression = match_expression(search_term, admin_term)
+        if not expression:
+            return queryset
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression])
+        )
+
+    condition = Q()
+    if search_term:
+        condition |= Q(customer__name__icontains=search_term) | Q(item__name__icontains=search_term)
+    if admin_term:
+        condition |= Q(recorded_by__username__icontains=admin_term)
+    return queryset.filter(condition) if condition else queryset
@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Sale
+from inventory import holds, stock
 from inventory.models import InventoryItem
 from customers.models import Customer
 
@@ -14,10 +16,15 @@ class SaleSerializer(serializers.ModelSerializer):
         fields = ['id', 'item', 'item_name', 'quantity', 'timestamp', 'payment_status', 'customer', 'customer_name', 'recorded_by', 'recorded_by_username', 'total_amount']
         read_only_fields = ['recorded_by', 'timestamp', 'total_amount']
 
+    def get_terminal(self):
+        # Other terminals' stock holds count against this sale
+        request = self.context.get('request')
+        return holds.terminal_id(request) if request is not None else None
+
     def validate(self, data):
-        item = data['item']
-        quantity = data['quantity']
-        if item.quantity < quantity:
+        item = data.get('item', getattr(self.instance, 'item', None))
+        quantity = data.get('quantity', getattr(self.instance, 'quantity', None))
+        if item is not None and quantity is not None and stock.shortfall(item, quantity, self.instance, self.get_terminal()):
             raise serializers.ValidationError("Not enough inventory")
         return data
 
@@ -26,9 +33,35 @@ class SaleSerializer(serializers.ModelSerializer):
         quantity = validated_data['quantity']
         total_amount = item.cost * quantity
         validated_data['total_amount'] = total_amount
-        return super().create(validated_data)
+        with transaction.atomic():
+            # Saved first so the stock movement can reference the sale
+            sale = super().create(validated_data)
+            try:
+                stock.apply_sale(item.pk, quantity, sale.pk, self.get_terminal())
+            except stock.InsufficientStock:
+                raise serializers.ValidationError("Not enough inventory")
+            return sale
+
+    def update(self, instance, validated_data):
+        item = validated_data.get('item', instance.item)
+        quantity = validated_data.get('quantity', instance.quantity)
+        if item.pk != instance.item_id or quantity != instance.quantity:
+            validated_data['total_amount'] = item.cost * quantity
+        with transaction.atomic():
+            try:
+                stock.apply_sale_edit(instance.item_id, instance.quantity, item.pk, quantity, instance.pk, self.get_terminal())
+            except stock.InsufficientStock:
+                raise serializers.ValidationError("Not enough inventory")
+            return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation['total_amount'] = float(representation['total_amount'])
-        return representation
\ No newline at end of file
+        return representation
+
+class SaleRowSerializer(serializers.Serializer):
+    # Plain ids so a whole batch can be validated without per-row lookups
+    item = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0)
+    customer = serializers.IntegerField(required=False, allow_null=True)
+    payment_status = serializers.ChoiceField(choices=Sale.PAYMENT_STATUS_CHOICES, default='PENDING')
@@ -0,0 +1,78 @@
+import logging
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from customers.models import CustomerTab
+from .models import Sale
+from . import rollups
+
+logger = logging.getLogger(__name__)
+
+
+class SettlementError(Exception):
+    def __init__(self, detail):
+        self.detail = detail
+        super().__init__(detail)
+
+
+def settle(customer, sale_ids=None, amount=None):
+    """Mark a customer's pending sales DONE in one UPDATE.
+
+    sale_ids limits it to those sales; amount settles the oldest pending
+    sales and has to cover them exactly, since there is nowhere to keep a
+    remainder.
+    """
+    with transaction.atomic():
+        pending = Sale.objects.filter(customer=customer, payment_status='PENDING')
+        if sale_ids is not None:
+            pending = pending.filter(pk__in=sale_ids)
+        rows = list(
+            pending.order_by('timestamp', 'id')
+            .values_list('id', 'timestamp', 'item_id', 'recorded_by_id', 'quantity', 'total_amount')
+        )
+        if sale_ids is not None and len(rows) != len(set(sale_ids)):
+            found = {row[0] for row in rows}
+            raise SettlementError({
+                "error": "Some sales are not pending sales of this customer",
+                "sales": sorted(set(sale_ids) - found),
+            })
+
+        if amount is not None:
+            # Oldest first, whole sales only; a sale is never half paid
+            selected = []
+            remaining = amount
+            for row in rows:
+                if row[5] > remaining:
+                    break
+                selected.append(row)
+                remaining -= row[5]
+            if remaining:
+                covered = amount - remaining
+                raise SettlementError({
+                    "error": "Amount does not cover whole sales",
+                    "covered": covered,
+                    "next_amount": covered + rows[len(selected)][5] if len(selected) < len(rows) else None,
+                })
+            rows = selected
+
+        settled_ids = [row[0] for row in rows]
+        total = sum((row[5] for row in rows), Decimal('0.00'))
+        if settled_ids:
+            # No save(), so no Sale or inventory signals; stock doesn't move
+            updated = Sale.objects.filter(pk__in=settled_ids, payment_status='PENDING').update(payment_status='DONE')
+            if updated != len(settled_ids):
+                # Another request settled or edited some of these first
+                raise SettlementError({"error": "Sales changed while settling, please retry"})
+            CustomerTab.apply_deltas({customer.pk: -total})
+            entries = []
+            for _, timestamp, item_id, recorded_by_id, quantity, amount_due in rows:
+                day = timezone.localdate(timestamp)
+                entries.append(((day, 'PENDING', item_id, recorded_by_id), -1, -quantity, -amount_due))
+                entries.append(((day, 'DONE', item_id, recorded_by_id), 1, quantity, amount_due))
+            rollups.apply_entries(entries)
+
+    logger.info(f"Settled {len(settled_ids)} sales totalling {total} for customer {customer.pk}")
+    return {
+        'settled': settled_ids,
+        'amount': total,
+    }
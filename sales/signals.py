@@ -1,21 +1,83 @@
+from django.db import connections
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from customers.models import CustomerTab
 from .models import Sale
+from . import rollups, search
 
-@receiver(post_save, sender=Sale)
-def update_inventory_on_sale(sender, instance, created, **kwargs):
-    inventory_item = instance.item
+# Stock movements are applied explicitly through inventory.stock by the
+# serializer and viewset, so these receivers keep the customer tab and the
+# daily rollups in step, using what the sale looked like when it was loaded.
+
+def _tab_deltas(old_entry, new_entry):
+    deltas = {}
+    if old_entry:
+        deltas[old_entry[0]] = deltas.get(old_entry[0], 0) - old_entry[1]
+    if new_entry:
+        deltas[new_entry[0]] = deltas.get(new_entry[0], 0) + new_entry[1]
+    return deltas
+
+def _update_tab(instance, created):
+    new_entry = instance.tab_entry()
     if created:
-        inventory_item.quantity -= instance.quantity
+        old_entry = None
+    elif hasattr(instance, '_loaded_tab_entry'):
+        old_entry = instance._loaded_tab_entry
     else:
-        original = Sale.objects.get(pk=instance.pk)
-        quantity_difference = instance.quantity - original.quantity
-        inventory_item.quantity -= quantity_difference
-    
-    inventory_item.save()
+        # Loaded without the tab fields; fall back to a full recompute
+        if instance.customer:
+            CustomerTab.update_tab_amount(instance.customer)
+        instance._loaded_tab_entry = new_entry
+        return
+    CustomerTab.apply_deltas(_tab_deltas(old_entry, new_entry))
+    instance._loaded_tab_entry = new_entry
+
+def _update_rollups(instance, created):
+    new_entry = instance.rollup_entry()
+    if created:
+        rollups.apply_entries([new_entry])
+    elif hasattr(instance, '_loaded_rollup_entry'):
+        rollups.apply_entries([rollups.negate(instance._loaded_rollup_entry), new_entry])
+    else:
+        # The sale's day never changes, so rebuilding that day is exact
+        day = new_entry[0][0]
+        rollups.rebuild(day, day)
+    instance._loaded_rollup_entry = new_entry
+
+@receiver(post_save, sender=Sale)
+def update_tab_and_rollups_on_sale(sender, instance, created, **kwargs):
+    _update_tab(instance, created)
+    _update_rollups(instance, created)
 
 @receiver(post_delete, sender=Sale)
-def update_inventory_on_sale_delete(sender, instance, **kwargs):
-    inventory_item = instance.item
-    inventory_item.quantity += instance.quantity
-    inventory_item.save()
\ No newline at end of file
+def update_tab_and_rollups_on_sale_delete(sender, instance, **kwargs):
+    old_entry = getattr(instance, '_loaded_tab_entry', instance.tab_entry())
+    CustomerTab.apply_deltas(_tab_deltas(old_entry, None))
+    rollup_entry = getattr(instance, '_loaded_rollup_entry', instance.rollup_entry())
+    rollups.apply_entries([rollups.negate(rollup_entry)])
+
+# Connected in SalesConfig.ready; the search index is maintained by SQLite
+# triggers, which have to be out of the way while migrations rebuild tables.
+
+SEARCH_TABLES = {'sales_sale', 'customers_customer', 'inventory_inventoryitem', 'users_customuser'}
+SEARCH_APPS = {'sales', 'customers', 'inventory', 'users'}
+
+def _migrates_search_tables(plan):
+    return any(migration.app_label in SEARCH_APPS for migration, backwards in plan or [])
+
+def drop_search_triggers(sender, using, plan=None, **kwargs):
+    connection = connections[using]
+    # Only migrations on the indexed tables can trip over the triggers
+    if search.is_supported(connection) and _migrates_search_tables(plan):
+        search.drop_triggers(connection)
+
+def install_search_index(sender, using, plan=None, **kwargs):
+    connection = connections[using]
+    if not (search.is_supported(connection) and SEARCH_TABLES.issubset(connection.introspection.table_names())):
+        return
+    created = search.install(connection)
+    # Rebuild when the table or triggers were missing, i.e. writes may have
+    # gone unindexed. flush sends post_migrate without a plan after emptying
+    # sales_sale but not the index table.
+    if created or plan is None:
+        search.rebuild(connection)
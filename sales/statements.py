@@ -0,0 +1,167 @@
+import csv
+import fcntl
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import groupby
+import django
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from customers.models import CustomerTab
+from .models import Sale
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.csv'
+LOCK_FILE = '.lock'
+INDEX_FIELDS = ['customer_id', 'customer_name', 'file', 'sales', 'pending_total', 'settled_total', 'total', 'tab_balance']
+STATEMENT_FIELDS = ['sale_id', 'timestamp', 'item', 'quantity', 'payment_status', 'amount']
+
+# Columns streamed per sale; rows are plain tuples so batches pickle cheaply
+COLUMNS = ('customer_id', 'customer__name', 'id', 'timestamp', 'item__name', 'quantity', 'payment_status', 'total_amount')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def default_period():
+    # Month to date
+    today = timezone.localdate()
+    return today.replace(day=1), today
+
+
+def output_directory(start, end):
+    return os.path.join(str(_setting('STATEMENTS_DIR', settings.BASE_DIR / 'statements')), f'{start}_{end}')
+
+
+class StatementRunInProgress(Exception):
+    def __init__(self, directory):
+        self.directory = directory
+        super().__init__(f"A statement run is already writing to {directory}")
+
+
+def _lock(directory):
+    # flock is dropped with the process, so a crashed run never leaves it held
+    os.makedirs(directory, exist_ok=True)
+    lock_file = open(os.path.join(directory, LOCK_FILE), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise StatementRunInProgress(directory)
+    return lock_file
+
+
+def _stream(start, end, chunk_size):
+    # Sales in the period plus every sale still pending, whenever it was made,
+    # so the pending total matches the tab. Ordered on sales_sale_customer_ts_idx,
+    # a chunk at a time from a server-side cursor
+    in_period = Q(
+        timestamp__gte=timezone.make_aware(datetime.combine(start, time.min)),
+        timestamp__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+    queryset = Sale.objects.filter(
+        in_period | Q(payment_status='PENDING'), customer__isnull=False,
+    ).order_by('customer_id', 'timestamp', 'id')
+    return queryset.values_list(*COLUMNS).iterator(chunk_size=chunk_size)
+
+
+def _batches(rows, size):
+    """Group the stream into lists of (customer_id, name, sales), size customers at a time."""
+    batch = []
+    for customer_id, customer_rows in groupby(rows, key=lambda row: row[0]):
+        customer_rows = list(customer_rows)
+        batch.append((customer_id, customer_rows[0][1], [row[2:] for row in customer_rows]))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_statements(directory, batch):
+    """Write one CSV per customer in batch and return their index rows. Runs in a worker process."""
+    entries = []
+    for customer_id, name, sales in batch:
+        totals = {'PENDING': Decimal('0.00'), 'DONE': Decimal('0.00')}
+        filename = f'customer_{customer_id}.csv'
+        with open(os.path.join(directory, filename), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([f'Statement for {name}'])
+            writer.writerow(STATEMENT_FIELDS)
+            for sale_id, timestamp, item, quantity, payment_status, amount in sales:
+                writer.writerow([sale_id, timestamp.isoformat(), item, quantity, payment_status, amount])
+                totals[payment_status] = totals.get(payment_status, Decimal('0.00')) + amount
+            writer.writerow([])
+            writer.writerow(['Pending', totals['PENDING']])
+            writer.writerow(['Settled', totals['DONE']])
+            writer.writerow(['Total', totals['PENDING'] + totals['DONE']])
+        entries.append({
+            'customer_id': customer_id,
+            'customer_name': name,
+            'file': filename,
+            'sales': len(sales),
+            'pending_total': str(totals['PENDING']),
+            'settled_total': str(totals['DONE']),
+            'total': str(totals['PENDING'] + totals['DONE']),
+        })
+    return entries
+
+
+def generate(start, end, directory=None, workers=None, chunk_size=None, batch_size=None):
+    """Write statements for every customer with sales between start and end (inclusive dates).
+
+    A statement also lists the customer's older sales that are still pending.
+    Returns a generator of each customer's index entry as its batch finishes;
+    the index file, sorted by customer, is written once it is exhausted.
+    Raises StatementRunInProgress straight away if another run holds the
+    directory.
+    """
+    directory = directory or output_directory(start, end)
+    lock_file = _lock(directory)
+    return _generate(start, end, directory, lock_file, workers, chunk_size, batch_size)
+
+
+def _generate(start, end, directory, lock_file, workers, chunk_size, batch_size):
+    workers = workers or _setting('STATEMENT_WORKERS', None) or os.cpu_count() or 1
+    chunk_size = chunk_size or _setting('STATEMENT_CHUNK_SIZE', 2000)
+    batch_size = batch_size or _setting('STATEMENT_BATCH_SIZE', 250)
+    logger.info(f"Generating statements for {start} to {end} into {directory} with {workers} workers")
+
+    balances = dict(CustomerTab.objects.values_list('customer_id', 'amount'))
+    entries = []
+
+    def collect(future):
+        for entry in future.result():
+            entry['tab_balance'] = str(balances.get(entry['customer_id'], Decimal('0.00')))
+            entries.append(entry)
+            yield entry
+
+    try:
+        # Spawned, not forked: the caller may be a threaded web worker running
+        # daemon threads. Unpickling write_statements imports this module and
+        # so the models, hence django.setup in each worker
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+        ) as executor:
+            pending = []
+            for batch in _batches(_stream(start, end, chunk_size), batch_size):
+                pending.append(executor.submit(write_statements, directory, batch))
+                # Keep the stream from running far ahead of the workers
+                while len(pending) >= workers * 2:
+                    yield from collect(pending.pop(0))
+            for future in pending:
+                yield from collect(future)
+
+        with open(os.path.join(directory, INDEX_FILE), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=INDEX_FIELDS)
+            writer.writeheader()
+            writer.writerows(sorted(entries, key=lambda entry: entry['customer_id']))
+        logger.info(f"Wrote {len(entries)} statements to {directory}")
+    finally:
+        lock_file.close()
@@ -1,3 +1,487 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from barMan_backend.query_budget import QueryBudgetMixin
+from customers.models import Customer, CustomerTab
+from inventory import stock
+from inventory.models import InventoryItem
+from .models import Sale, SaleDailyRollup
+from . import rollups, search, signals, statements
+from .pagination import SaleKeysetPagination
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(LOW_STOCK_ALERTS_ASYNC=False)
+class SaleTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.item = InventoryItem.objects.create(name='Beer', cost=Decimal('2.50'), quantity=10)
+        self.customer = Customer.objects.create(name='Bob', phone_number='08030000000', tab_limit=Decimal('100.00'))
+
+    def sell(self, quantity, customer=None, **extra):
+        data = {'item': self.item.pk, 'quantity': quantity, **extra}
+        if customer is not None:
+            data['customer'] = customer.pk
+        return self.client.post('/api/sales/', data, format='json')
+
+    def stock(self):
+        self.item.refresh_from_db()
+        return self.item.quantity
+
+    def tab(self, customer=None):
+        tab = CustomerTab.objects.filter(customer=customer or self.customer).first()
+        return tab.amount if tab else Decimal('0.00')
+
+
+class StockTests(SaleTestCase):
+    def test_sale_takes_its_quantity_from_stock(self):
+        response = self.sell(4)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.stock(), 6)
+
+    def test_sale_larger_than_stock_is_refused_and_leaves_nothing_behind(self):
+        response = self.sell(11)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(), 10)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_conditional_update_refuses_without_changing_the_row(self):
+        with self.assertRaises(stock.InsufficientStock):
+            stock.take(self.item.pk, 11)
+        self.assertEqual(self.stock(), 10)
+        stock.take(self.item.pk, 10)
+        self.assertEqual(self.stock(), 0)
+
+    def test_take_many_moves_every_item_or_none(self):
+        gin = InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=3)
+        with self.assertRaises(stock.InsufficientStock) as refused:
+            stock.take_many({self.item.pk: 5, gin.pk: 4})
+        self.assertEqual((refused.exception.item_id, refused.exception.available), (gin.pk, 3))
+        gin.refresh_from_db()
+        self.assertEqual((self.stock(), gin.quantity), (10, 3))
+
+    def test_edit_moves_only_the_difference(self):
+        sale_id = self.sell(3).data['id']
+        response = self.client.patch(f'/api/sales/{sale_id}/', {'quantity': 5}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.stock(), 5)
+        self.client.patch(f'/api/sales/{sale_id}/', {'quantity': 1}, format='json')
+        self.assertEqual(self.stock(), 9)
+
+    def test_edit_beyond_stock_is_refused_and_rolled_back(self):
+        sale_id = self.sell(3).data['id']
+        response = self.client.patch(f'/api/sales/{sale_id}/', {'quantity': 20}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(), 7)
+        self.assertEqual(Sale.objects.get(pk=sale_id).quantity, 3)
+
+    def test_edit_to_another_item_returns_the_old_stock(self):
+        gin = InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=3)
+        sale_id = self.sell(2).data['id']
+        response = self.client.patch(f'/api/sales/{sale_id}/', {'item': gin.pk, 'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        gin.refresh_from_db()
+        self.assertEqual((self.stock(), gin.quantity), (10, 0))
+
+    def test_delete_returns_the_stock(self):
+        sale_id = self.sell(3).data['id']
+        self.assertEqual(self.client.delete(f'/api/sales/{sale_id}/').status_code, 204)
+        self.assertEqual(self.stock(), 10)
+
+
+class TabTests(SaleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = Customer.objects.create(name='Alice', phone_number='08031111111', tab_limit=Decimal('100.00'))
+
+    def test_pending_sale_adds_to_the_tab(self):
+        self.sell(2, self.customer)
+        self.sell(1, self.customer, payment_status='DONE')
+        self.assertEqual(self.tab(), Decimal('5.00'))
+
+    def test_edit_moves_the_tab_by_the_difference(self):
+        sale_id = self.sell(2, self.customer).data['id']
+        self.client.patch(f'/api/sales/{sale_id}/', {'quantity': 4}, format='json')
+        self.assertEqual(self.tab(), Decimal('10.00'))
+
+    def test_allocating_moves_the_amount_between_tabs(self):
+        sale_id = self.sell(2, self.customer).data['id']
+        response = self.client.post(f'/api/sales/{sale_id}/allocate_to_customer/', {'customer_id': self.alice.pk}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((self.tab(), self.tab(self.alice)), (Decimal('0.00'), Decimal('5.00')))
+
+    def test_payment_takes_the_sale_off_the_tab_and_back_on(self):
+        sale_id = self.sell(2, self.customer).data['id']
+        url = f'/api/sales/{sale_id}/update_payment_status/'
+        self.client.patch(url, {'payment_status': 'DONE'}, format='json')
+        self.assertEqual(self.tab(), Decimal('0.00'))
+        self.client.patch(url, {'payment_status': 'PENDING'}, format='json')
+        self.assertEqual(self.tab(), Decimal('5.00'))
+
+    def test_delete_takes_the_sale_off_the_tab(self):
+        keep = self.sell(1, self.customer).data['id']
+        sale_id = self.sell(2, self.customer).data['id']
+        self.client.delete(f'/api/sales/{sale_id}/')
+        self.assertEqual(self.tab(), Decimal('2.50'))
+        self.assertTrue(Sale.objects.filter(pk=keep).exists())
+
+    def test_reconcile_repairs_drifted_tabs(self):
+        self.sell(2, self.customer)
+        self.sell(1, self.alice)
+        CustomerTab.objects.filter(customer=self.customer).update(amount=Decimal('99.00'))
+        CustomerTab.objects.filter(customer=self.alice).delete()
+        call_command('reconcile_tabs', '--dry-run', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(self.tab(), Decimal('99.00'))
+        call_command('reconcile_tabs', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual((self.tab(), self.tab(self.alice)), (Decimal('5.00'), Decimal('2.50')))
+        tab = CustomerTab.objects.get(customer=self.customer)
+        self.assertEqual(tab.available_credit, Decimal('95.00'))
+
+
+class RollupTests(SaleTestCase):
+    def rollup_rows(self):
+        return sorted(
+            SaleDailyRollup.objects.filter(sale_count__gt=0)
+            .values_list('day', 'payment_status', 'item_id', 'recorded_by_id', 'sale_count', 'quantity', 'total_amount')
+        )
+
+    def test_sale_writes_keep_the_rollups_equal_to_a_rebuild(self):
+        gin = InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=20)
+        first = self.sell(2, self.customer).data['id']
+        second = self.sell(1).data['id']
+        self.client.patch(f'/api/sales/{first}/', {'item': gin.pk, 'quantity': 3}, format='json')
+        self.client.patch(f'/api/sales/{first}/update_payment_status/', {'payment_status': 'DONE'}, format='json')
+        self.client.delete(f'/api/sales/{second}/')
+        self.sell(4, self.customer)
+        incremental = self.rollup_rows()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.rollup_rows())
+
+    def test_summaries_match_a_live_aggregate_across_whole_and_partial_days(self):
+        now = timezone.now()
+        for days_ago, quantity in ((0, 1), (1, 2), (1, 1), (3, 4)):
+            sale_id = self.sell(quantity, self.customer if quantity % 2 else None).data['id']
+            Sale.objects.filter(pk=sale_id).update(timestamp=now - timedelta(days=days_ago, hours=1))
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+
+        today = timezone.localdate(now)
+        ranges = [
+            (None, None),
+            (today - timedelta(days=1), today),
+            (today - timedelta(days=3), today - timedelta(days=1)),
+            (now - timedelta(days=2), now),
+            (now - timedelta(days=1, hours=2), now - timedelta(hours=2)),
+        ]
+        for start, end in ranges:
+            sales = Sale.objects.all()
+            if isinstance(start, datetime):
+                sales = sales.filter(timestamp__gte=start, timestamp__lte=end)
+            elif start is not None:
+                sales = sales.filter(timestamp__date__gte=start, timestamp__date__lte=end)
+            self.assertEqual(rollups.summarize(start, end), rollups.live_totals(sales), (start, end))
+
+
+class IdempotencyTests(SaleTestCase):
+    def post(self, url, data, key):
+        return self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response_without_selling_again(self):
+        data = {'item': self.item.pk, 'quantity': 2, 'customer': self.customer.pk}
+        first = self.post('/api/sales/', data, 'sale-1')
+        retry = self.post('/api/sales/', data, 'sale-1')
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual((self.stock(), self.tab()), (8, Decimal('5.00')))
+
+    def test_bulk_retry_is_replayed(self):
+        rows = [{'item': self.item.pk, 'quantity': 1}] * 3
+        self.post('/api/sales/multiple/', rows, 'bulk-1')
+        retry = self.post('/api/sales/multiple/', rows, 'bulk-1')
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.stock(), 7)
+
+    def test_refusals_are_replayed_too(self):
+        data = {'item': self.item.pk, 'quantity': 50}
+        first = self.post('/api/sales/', data, 'sale-2')
+        self.assertEqual(first.status_code, 400)
+        self.item.quantity = 100
+        self.item.save()
+        retry = self.post('/api/sales/', data, 'sale-2')
+        self.assertEqual((retry.status_code, retry.data), (400, first.data))
+        self.assertFalse(Sale.objects.exists())
+
+    def test_key_reused_for_another_payload_is_rejected(self):
+        self.post('/api/sales/', {'item': self.item.pk, 'quantity': 1}, 'sale-3')
+        response = self.post('/api/sales/', {'item': self.item.pk, 'quantity': 2}, 'sale-3')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.stock(), 9)
+
+    def test_keys_are_per_user(self):
+        data = {'item': self.item.pk, 'quantity': 1}
+        self.post('/api/sales/', data, 'shared')
+        other = User.objects.create_superuser('other', 'other@example.com', 'password')
+        self.client.force_authenticate(other)
+        response = self.post('/api/sales/', data, 'shared')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Sale.objects.count(), 2)
+
+
+class BulkSaleTests(SaleTestCase):
+    def test_creates_every_row_and_moves_stock_and_tab_once(self):
+        gin = InventoryItem.objects.create(name='Gin', cost=Decimal('5.00'), quantity=100)
+        rows = [
+            {'item': self.item.pk, 'quantity': 1, 'customer': self.customer.pk},
+            {'item': gin.pk, 'quantity': 2, 'customer': self.customer.pk, 'payment_status': 'DONE'},
+        ] * 3
+        response = self.client.post('/api/sales/multiple/', rows, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 6)
+        gin.refresh_from_db()
+        self.assertEqual((self.stock(), gin.quantity), (7, 94))
+        self.assertEqual(self.tab(), Decimal('7.50'))
+
+    def test_insufficient_stock_keeps_the_serializer_error_body(self):
+        rows = [{'item': self.item.pk, 'quantity': 6}, {'item': self.item.pk, 'quantity': 5}]
+        response = self.client.post('/api/sales/multiple/', rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'non_field_errors': ['Not enough inventory']})
+        self.assertEqual(self.stock(), 10)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_tab_limit_rejects_the_whole_batch(self):
+        rows = [{'item': self.item.pk, 'quantity': 5, 'customer': self.customer.pk}]
+        self.customer.tab_limit = Decimal('10.00')
+        self.customer.save()
+        response = self.client.post('/api/sales/multiple/', rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Tab limit exceeded')
+        self.assertEqual(self.stock(), 10)
+        self.assertFalse(Sale.objects.exists())
+
+
+class ImportTests(SaleTestCase):
+    def import_lines(self, lines, chunk_size):
+        body = '\n'.join(lines).encode()
+        response = self.client.generic(
+            'POST', f'/api/sales/import/?chunk_size={chunk_size}', body, content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_results_come_back_in_line_order(self):
+        good = json.dumps({'item': self.item.pk, 'quantity': 1})
+        lines = [good, 'not json', good, '[1]', '', good, json.dumps({'item': self.item.pk, 'quantity': 100})]
+        results = self.import_lines(lines, chunk_size=2)
+        self.assertEqual([result['line'] for result in results], [1, 2, 3, 4, 6, 7])
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['created', 'error', 'created', 'error', 'created', 'error'],
+        )
+        self.assertEqual(Sale.objects.count(), 3)
+        self.assertEqual(self.stock(), 7)
+
+
+class StatementTests(SaleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = Customer.objects.create(name='Alice', phone_number='08031111111', tab_limit=Decimal('100.00'))
+        self.carol = Customer.objects.create(name='Carol', phone_number='08032222222', tab_limit=Decimal('100.00'))
+        self.today = timezone.localdate()
+        self.start = self.today - timedelta(days=3)
+        old = timezone.now() - timedelta(days=40)
+        self.recent = [self.sell(2, self.customer).data['id'], self.sell(1, self.customer, payment_status='DONE').data['id']]
+        self.outstanding = self.sell(1, self.customer).data['id']
+        settled = self.sell(1, self.customer, payment_status='DONE').data['id']
+        self.alice_outstanding = self.sell(1, self.alice).data['id']
+        carol_settled = self.sell(1, self.carol, payment_status='DONE').data['id']
+        self.sell(1)
+        Sale.objects.filter(pk__in=[self.outstanding, settled, self.alice_outstanding, carol_settled]).update(timestamp=old)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def read(self, name):
+        with open(os.path.join(self.directory.name, name), newline='') as f:
+            return list(csv.reader(f))
+
+    def index(self):
+        with open(os.path.join(self.directory.name, statements.INDEX_FILE), newline='') as f:
+            return list(csv.DictReader(f))
+
+    def test_statements_include_the_period_and_every_outstanding_sale(self):
+        entries = list(statements.generate(self.start, self.today, self.directory.name, workers=1, batch_size=1))
+        self.assertEqual(sorted(entry['customer_id'] for entry in entries), [self.customer.pk, self.alice.pk])
+
+        rows = self.read(f'customer_{self.customer.pk}.csv')
+        self.assertEqual(rows[0], ['Statement for Bob'])
+        self.assertEqual(rows[1], statements.STATEMENT_FIELDS)
+        self.assertEqual([int(row[0]) for row in rows[2:5]], [self.outstanding] + self.recent)
+        self.assertEqual(rows[5:], [[], ['Pending', '7.50'], ['Settled', '2.50'], ['Total', '10.00']])
+
+        index = self.index()
+        self.assertEqual([int(entry['customer_id']) for entry in index], sorted([self.customer.pk, self.alice.pk]))
+        for entry in index:
+            self.assertEqual(entry['pending_total'], entry['tab_balance'])
+        bob = next(entry for entry in index if int(entry['customer_id']) == self.customer.pk)
+        self.assertEqual((bob['file'], bob['sales'], bob['total']), (f'customer_{self.customer.pk}.csv', '3', '10.00'))
+
+    def test_a_second_run_on_the_same_directory_is_refused(self):
+        running = statements.generate(self.start, self.today, self.directory.name, workers=1)
+        with self.assertRaises(statements.StatementRunInProgress):
+            statements.generate(self.start, self.today, self.directory.name, workers=1)
+        list(running)
+        self.assertEqual(len(list(statements.generate(self.start, self.today, self.directory.name, workers=1))), 2)
+
+    def test_command_writes_the_statements_and_index(self):
+        out = StringIO()
+        call_command(
+            'generate_statements', '--start', str(self.start), '--end', str(self.today),
+            '--output', self.directory.name, '--workers', '1', stdout=out,
+        )
+        self.assertIn('2 statements', out.getvalue())
+        self.assertEqual(len(self.index()), 2)
+        self.assertEqual(self.read(f'customer_{self.alice.pk}.csv')[-3:], [['Pending', '2.50'], ['Settled', '0.00'], ['Total', '2.50']])
+
+    def test_endpoint_streams_an_entry_per_customer_then_a_summary(self):
+        with override_settings(STATEMENTS_DIR=self.directory.name, STATEMENT_WORKERS=1):
+            response = self.client.post('/api/sales/statements/', {'start': str(self.start), 'end': str(self.today)}, format='json')
+            self.assertEqual(response.status_code, 200)
+            lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        *entries, done = lines
+        self.assertEqual(sorted(entry['customer_id'] for entry in entries), sorted([self.customer.pk, self.alice.pk]))
+        self.assertEqual(
+            done, {'status': 'done', 'start': str(self.start), 'end': str(self.today), 'statements': 2, 'index': statements.INDEX_FILE}
+        )
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, f'{self.start}_{self.today}', statements.INDEX_FILE)))
+
+    def test_endpoint_refuses_a_bad_range_or_a_run_already_in_progress(self):
+        response = self.client.post('/api/sales/statements/', {'start': str(self.today), 'end': str(self.start)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with override_settings(STATEMENTS_DIR=self.directory.name):
+            running = statements.generate(self.start, self.today, workers=1)
+            response = self.client.post('/api/sales/statements/', {'start': str(self.start), 'end': str(self.today)}, format='json')
+            self.assertEqual(response.status_code, 409)
+            list(running)
+
+
+class KeysetPaginationTests(SaleTestCase):
+    def setUp(self):
+        super().setUp()
+        base = timezone.now()
+        for i in range(7):
+            sale = Sale.objects.create(item=self.item, quantity=1, recorded_by=self.user)
+            # Pairs of sales share a timestamp so the id tie-break matters
+            Sale.objects.filter(pk=sale.pk).update(timestamp=base - timedelta(minutes=i // 2))
+        self.newest_first = list(Sale.objects.order_by('-timestamp', '-id').values_list('pk', flat=True))
+
+    def page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_walks_forward_and_back_without_gaps(self):
+        seen = []
+        data = self.page('/api/sales/?pagination=cursor&page_size=3')
+        pages = [data]
+        seen += [row['id'] for row in data['sales']]
+        while data['next']:
+            data = self.page(data['next'])
+            pages.append(data)
+            seen += [row['id'] for row in data['sales']]
+        self.assertEqual(seen, self.newest_first)
+
+        back = self.page(pages[-1]['previous'])
+        self.assertEqual([row['id'] for row in back['sales']], self.newest_first[3:6])
+
+    def plan(self, cursor):
+        request = Request(APIRequestFactory().get('/api/sales/', {'page_size': 3, 'cursor': cursor}))
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            SaleKeysetPagination().paginate_queryset(Sale.objects.all(), request)
+        # EXPLAIN with bound parameters, as the page query runs; inlined
+        # constants let SQLite derive the bound on its own
+        sql, params = queries[0]
+        with connection.cursor() as db:
+            db.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(row[-1] for row in db.fetchall())
+
+    def test_cursor_pages_start_the_index_scan_at_the_cursor(self):
+        paginator = SaleKeysetPagination()
+        paginator.paginate_queryset(Sale.objects.all(), Request(APIRequestFactory().get('/api/sales/', {'page_size': 3})))
+        middle = paginator.page[-1]
+        for cursor in (paginator.encode_cursor(middle), paginator.encode_cursor(middle, previous=True)):
+            plan = self.plan(cursor)
+            # A range search on the index, not an OR of two searches sorted afterwards
+            self.assertIn('SEARCH sales_sale USING INDEX sales_sale_ts_id_idx', plan)
+            self.assertNotIn('MULTI-INDEX OR', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class SearchIndexMigrateTests(TestCase):
+    def migrate(self, *app_labels):
+        plan = [(SimpleNamespace(app_label=label), False) for label in app_labels]
+        signals.drop_search_triggers(sender=None, using='default', plan=plan)
+        with mock.patch.object(search, 'rebuild') as rebuild:
+            signals.install_search_index(sender=None, using='default', plan=plan)
+        return rebuild.called
+
+    def test_migrate_without_search_table_changes_skips_the_rebuild(self):
+        self.assertFalse(self.migrate())
+        self.assertFalse(self.migrate('auth', 'contenttypes'))
+
+    def test_migrating_an_indexed_app_recreates_the_triggers_and_rebuilds(self):
+        self.assertTrue(self.migrate('sales'))
+        self.assertFalse(search.install(connection))
+
+    def test_flush_rebuilds_without_a_plan(self):
+        with mock.patch.object(search, 'rebuild') as rebuild:
+            signals.install_search_index(sender=None, using='default')
+        rebuild.assert_called_once()
+
+
+class QueryBudgetTests(QueryBudgetMixin, SaleTestCase):
+    def setUp(self):
+        super().setUp()
+        # Distinct items, customers and users, so a per-row lookup shows up as more queries
+        items = InventoryItem.objects.bulk_create(
+            [InventoryItem(name=f'Item {i}', cost=Decimal('1.00'), quantity=10) for i in range(5)]
+        )
+        customers = Customer.objects.bulk_create(
+            [Customer(name=f'Customer {i}', phone_number=f'0803000000{i}') for i in range(5)]
+        )
+        users = [User.objects.create_user(f'clerk{i}', f'clerk{i}@example.com', 'password') for i in range(3)]
+        Sale.objects.bulk_create([
+            Sale(item=items[i % 5], customer=customers[i % 5], recorded_by=users[i % 3], quantity=1, total_amount=Decimal('1.00'))
+            for i in range(60)
+        ])
+
+    def test_sale_list(self):
+        self.assertQueryCountFlat(self.client, '/api/sales/')
+
+    def test_sale_list_by_cursor(self):
+        self.assertQueryCountFlat(self.client, '/api/sales/', pagination='cursor')
@@ -3,17 +3,23 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Sale
+from . import bulk, rollups, search, statements
+from .pagination import SaleKeysetPagination
+from .idempotency import idempotent
+from .importer import import_sales, to_ndjson, DEFAULT_CHUNK_SIZE
 from .serializers import SaleSerializer
-from customers.models import Customer, CustomerTab
+from customers.models import Customer
+from customers import credit
 from .permissions import IsSuperAdmin
 from django.db import transaction
 from inventory.models import InventoryItem
-from django.db.models import Sum, Q
+from inventory import holds, stock
 from rest_framework.pagination import PageNumberPagination
 from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from datetime import timedelta
+from django.http import StreamingHttpResponse
 from rest_framework.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
@@ -24,24 +30,32 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 class SaleViewSet(viewsets.ModelViewSet):
-    queryset = Sale.objects.all().order_by('-timestamp')
+    # SaleSerializer reads item.name, customer.name and recorded_by.username
+    queryset = Sale.objects.select_related('item', 'customer', 'recorded_by').order_by('-timestamp')
     serializer_class = SaleSerializer
     permission_classes = [IsSuperAdmin]
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['payment_status', 'customer']
 
+    @property
+    def paginator(self):
+        # ?pagination=cursor (or any ?cursor=) opts into keyset pagination
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or params.get('cursor'):
+                self._paginator = SaleKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def perform_create(self, serializer):
         serializer.save(recorded_by=self.request.user)
 
-    def perform_update(self, serializer):
+    def perform_destroy(self, instance):
         with transaction.atomic():
-            old_customer = self.get_object().customer
-            sale = serializer.save()
-            if old_customer:
-                CustomerTab.update_tab_amount(old_customer)
-            if sale.customer:
-                CustomerTab.update_tab_amount(sale.customer)
+            stock.revert_sale(instance.item_id, instance.quantity, instance.pk)
+            instance.delete()
 
     @action(detail=True, methods=['patch'])
     def update_payment_status(self, request, pk=None):
@@ -50,11 +64,9 @@ class SaleViewSet(viewsets.ModelViewSet):
         if status_value not in ['PENDING', 'DONE']:
             return Response({'error': 'Invalid payment status'}, status=status.HTTP_400_BAD_REQUEST)
         
-        with transaction.atomic():
-            sale.payment_status = status_value
-            sale.save()
-            if sale.customer:
-                CustomerTab.update_tab_amount(sale.customer)
+        # The tab moves by this sale's amount inside save()
+        sale.payment_status = status_value
+        sale.save()
         
         return Response({'status': 'payment status updated'})
 
@@ -67,60 +79,61 @@ class SaleViewSet(viewsets.ModelViewSet):
         except Customer.DoesNotExist:
             return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        with transaction.atomic():
-            old_customer = sale.customer
-            sale.customer = customer
-            sale.save()
-            
-            if old_customer:
-                CustomerTab.update_tab_amount(old_customer)
-            CustomerTab.update_tab_amount(customer)
+        # Both the old and the new customer's tab are adjusted inside save()
+        sale.customer = customer
+        sale.save()
         
         return Response({'status': 'sale allocated to customer'})
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def multiple(self, request):
-        sales_data = request.data
-        created_sales = []
-
         try:
-            with transaction.atomic():
-                for sale_data in sales_data:
-                    serializer = self.get_serializer(data=sale_data)
-                    if serializer.is_valid():
-                        # Check inventory
-                        item = serializer.validated_data['item']
-                        quantity = serializer.validated_data['quantity']
-                        if item.quantity < quantity:
-                            return Response({
-                                "error": f"Insufficient inventory for {item.name}. Available: {item.quantity}, Requested: {quantity}"
-                            }, status=status.HTTP_400_BAD_REQUEST)
-                        
-                        # Calculate total_amount
-                        total_amount = item.cost * quantity
-
-                        # Check tab limit
-                        customer = serializer.validated_data.get('customer')
-                        if customer:
-                            customer_tab, _ = CustomerTab.objects.get_or_create(customer=customer)
-                            new_tab_amount = customer_tab.amount + total_amount
-                            if new_tab_amount > customer.tab_limit:
-                                raise ValidationError({
-                                    "error": "Tab limit exceeded",
-                                    "customer_name": customer.name,
-                                    "customer_id": customer.id,
-                                    "current_limit": customer.tab_limit,
-                                    "required_limit": new_tab_amount
-                                })
-                        
-                        sale = serializer.save(recorded_by=request.user, total_amount=total_amount)
-                        created_sales.append(self.get_serializer(sale).data)
-                    else:
-                        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            return Response(created_sales, status=status.HTTP_201_CREATED)
-        except ValidationError as e:
+            sales = bulk.create_sales(request.data, request.user, holds.terminal_id(request))
+        except bulk.BulkSaleError as e:
             return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(sales, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_ndjson(self, request):
+        # Read the raw body line by line instead of request.data so large
+        # offline backlogs are never buffered in memory
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            return Response({'error': 'Invalid chunk_size'}, status=status.HTTP_400_BAD_REQUEST)
+        chunk_size = min(max(chunk_size, 1), 5000)
+        logger.info(f"Streaming sale import started by {request.user} with chunk size {chunk_size}")
+        results = import_sales(request._request, request.user, chunk_size=chunk_size)
+        return StreamingHttpResponse(to_ndjson(results), content_type='application/x-ndjson')
+
+    @action(detail=False, methods=['post'], url_path='statements')
+    def generate_statements(self, request):
+        # Same run as the generate_statements command, streamed back as NDJSON:
+        # one index entry per customer as it is written, then a summary line.
+        # Workers are spawned, and one run at a time holds a period's directory
+        default_start, default_end = statements.default_period()
+        start = parse_date(request.data.get('start') or '') if request.data.get('start') else default_start
+        end = parse_date(request.data.get('end') or '') if request.data.get('end') else default_end
+        if start is None or end is None or start > end:
+            return Response({'error': 'Invalid start/end range'}, status=status.HTTP_400_BAD_REQUEST)
+        directory = statements.output_directory(start, end)
+        try:
+            entries = statements.generate(start, end, directory)
+        except statements.StatementRunInProgress:
+            return Response({'error': 'Statements for this period are already being generated'}, status=status.HTTP_409_CONFLICT)
+        logger.info(f"Statement run for {start} to {end} started by {request.user}")
+
+        def results():
+            count = 0
+            for entry in entries:
+                count += 1
+                yield entry
+            yield {'status': 'done', 'start': str(start), 'end': str(end), 'statements': count, 'index': statements.INDEX_FILE}
 
+        return StreamingHttpResponse(to_ndjson(results()), content_type='application/x-ndjson')
+
+    @idempotent
     def create(self, request, *args, **kwargs):
         logger.info(f"Received sale data: {request.data}")
         serializer = self.get_serializer(data=request.data)
@@ -130,10 +143,12 @@ class SaleViewSet(viewsets.ModelViewSet):
             customer = serializer.validated_data.get('customer')
             
             if customer:
-                customer_tab, created = CustomerTab.objects.get_or_create(customer=customer)
-                new_tab_amount = customer_tab.amount + serializer.validated_data['total_amount']
-                
-                if new_tab_amount > customer.tab_limit:
+                # One read of the precomputed credit; no tab row is created here
+                available_credit, _ = credit.available([customer.pk])[customer.pk]
+                total_amount = serializer.validated_data['item'].cost * serializer.validated_data['quantity']
+                new_tab_amount = customer.tab_limit - available_credit + total_amount
+
+                if total_amount > available_credit:
                     raise ValidationError({
                         "error": "This sale would exceed the customer's tab limit",
                         "current_limit": customer.tab_limit,
@@ -168,6 +183,23 @@ class SaleViewSet(viewsets.ModelViewSet):
             logger.error(f"Error updating tab limit: {str(e)}")
             return Response({"error": "Failed to update tab limit"}, status=status.HTTP_400_BAD_REQUEST)
 
+    count_estimator = None
+
+    def get_summary(self, queryset, start=None, end=None, live=False, payment_status=None):
+        # Whole days come from the daily rollups; filters the rollups cannot
+        # express (customer, free-text search) fall back to a live aggregate
+        if live:
+            totals = rollups.live_totals(queryset)
+        else:
+            dimensions = {}
+            if payment_status:
+                dimensions['payment_status'] = payment_status
+            totals = rollups.summarize(start or None, end or None, **dimensions)
+        return {
+            'total_done': float(totals['DONE']),
+            'total_pending': float(totals['PENDING'])
+        }
+
     def list(self, request, *args, **kwargs):
         logger.info("Fetching sales list")
         queryset = self.filter_queryset(self.get_queryset())
@@ -183,6 +215,13 @@ class SaleViewSet(viewsets.ModelViewSet):
             if end_date:
                 queryset = queryset.filter(timestamp__date__lte=end_date)
 
+        if not self.request.query_params.get('customer'):
+            payment_status = self.request.query_params.get('payment_status')
+            self.count_estimator = lambda: rollups.estimate_count(
+                start_date or None, end_date or None,
+                **({'payment_status': payment_status} if payment_status else {})
+            )
+
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -196,21 +235,21 @@ class SaleViewSet(viewsets.ModelViewSet):
                 'previous': None,
             }
 
-        total_done = queryset.filter(payment_status='DONE').aggregate(
-            total=Sum('total_amount'))['total'] or 0
-        total_pending = queryset.filter(payment_status='PENDING').aggregate(
-            total=Sum('total_amount'))['total'] or 0
+        summary = self.get_summary(
+            queryset, start_date, end_date,
+            live=bool(self.request.query_params.get('customer')),
+            payment_status=self.request.query_params.get('payment_status'),
+        )
 
         response_data = {
             'sales': paginated_data['results'],
-            'summary': {
-                'total_done': float(total_done),
-                'total_pending': float(total_pending)
-            },
+            'summary': summary,
             'next': paginated_data.get('next'),
             'previous': paginated_data.get('previous'),
             'count': paginated_data.get('count')
         }
+        if 'count_estimated' in paginated_data:
+            response_data['count_estimated'] = paginated_data['count_estimated']
         logger.info(f"Returning sales data: {response_data}")
         return Response(response_data)
 
@@ -228,11 +267,9 @@ class SaleViewSet(viewsets.ModelViewSet):
         logger.info(f"Filters received: search_term={search_term}, admin_term={admin_term}, start_date={start_date}, end_date={end_date}, period={period}")
 
         if search_term or admin_term:
-            queryset = queryset.filter(
-                Q(customer__name__icontains=search_term) | 
-                Q(item__name__icontains=search_term) |
-                Q(recorded_by__username__icontains=admin_term)
-            )
+            # Prefix-match the names through the full-text index, then the
+            # page below only hydrates the matching sales
+            queryset = search.filter_sales(queryset, search_term, admin_term)
 
         if period:
             end_date = timezone.now()
@@ -263,6 +300,9 @@ class SaleViewSet(viewsets.ModelViewSet):
 
         logger.info(f"Filtered queryset: {queryset.query}")
 
+        if not (search_term or admin_term):
+            self.count_estimator = lambda: rollups.estimate_count(start_date or None, end_date or None)
+
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -271,15 +311,9 @@ class SaleViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(queryset, many=True)
             result = Response(serializer.data)
 
-        total_done = queryset.filter(payment_status='DONE').aggregate(
-            total=Sum('total_amount'))['total'] or 0
-        total_pending = queryset.filter(payment_status='PENDING').aggregate(
-            total=Sum('total_amount'))['total'] or 0
-
-        result.data['summary'] = {
-            'total_done': float(total_done),
-            'total_pending': float(total_pending)
-        }
+        result.data['summary'] = self.get_summary(
+            queryset, start_date, end_date, live=bool(search_term or admin_term)
+        )
 
         logger.info(f"Returning search results: {result.data}")
         return result
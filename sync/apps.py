@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+
+
+class SyncConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'sync'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from customers.models import Customer, CustomerTab
+        from inventory.models import InventoryItem
+        from . import changes
+        changes.track(InventoryItem)
+        changes.track(Customer)
+        changes.track(CustomerTab)
+        # Logins save last_login; only the permission flags matter to terminals
+        changes.track(get_user_model(), fields=changes.USER_FIELDS)
@@ -0,0 +1,46 @@
+from django.db.models.signals import post_save, post_delete
+from .models import Change
+
+USER_FIELDS = frozenset([
+    'username', 'is_active', 'is_superuser', 'can_update_inventory', 'can_report_sales',
+    'can_create_customers', 'can_create_tabs', 'can_update_tabs', 'can_manage_users',
+])
+
+_fields = {}
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def record(model, pks):
+    """Move model's pks to the head of the change log.
+
+    Call inside the writing transaction, for writes that skip model signals
+    (queryset.update, bulk_update, bulk_create).
+    """
+    pks = {pk for pk in pks if pk is not None}
+    if not pks:
+        return
+    name = label(model)
+    Change.objects.filter(model=name, object_id__in=pks).delete()
+    Change.objects.bulk_create([Change(model=name, object_id=pk) for pk in sorted(pks)])
+
+
+def _saved(sender, instance, update_fields=None, **kwargs):
+    fields = _fields.get(label(sender))
+    if fields is not None and update_fields is not None and not fields.intersection(update_fields):
+        return
+    record(sender, [instance.pk])
+
+
+def _deleted(sender, instance, **kwargs):
+    record(sender, [instance.pk])
+
+
+def track(model, fields=None):
+    """Log every save and delete of model; call from AppConfig.ready."""
+    name = label(model)
+    _fields[name] = fields
+    post_save.connect(_saved, sender=model, weak=False, dispatch_uid=f'sync-save:{name}')
+    post_delete.connect(_deleted, sender=model, weak=False, dispatch_uid=f'sync-delete:{name}')
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def seed_changes(apps, schema_editor):
+    # Every existing row starts out changed, so since=0 is a full download
+    Change = apps.get_model('sync', 'Change')
+    for label in ('inventory.inventoryitem', 'customers.customer', 'customers.customertab', settings.AUTH_USER_MODEL.lower()):
+        model = apps.get_model(label)
+        Change.objects.bulk_create(
+            [Change(model=label, object_id=pk) for pk in model.objects.order_by('pk').values_list('pk', flat=True)],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0001_initial'),
+        ('inventory', '0007_inventoryitem_delete_requested_index'),
+        ('customers', '0005_customer_tab_limit_alter_customertab_customer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class Change(models.Model):
+    # One row per synced object, re-inserted on every change, so version is
+    # the server version of the object's latest change and only ever grows
+    version = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'object_id'], name='sync_change_model_object_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.object_id} @ {self.version}"
@@ -0,0 +1,9 @@
+from rest_framework import serializers
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+class UserPermissionsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'is_active', 'is_superuser', 'can_update_inventory', 'can_report_sales', 'can_create_customers', 'can_create_tabs', 'can_update_tabs', 'can_manage_users']
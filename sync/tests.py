@@ -0,0 +1,70 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from customers.models import Customer
+from inventory.models import InventoryItem
+
+User = get_user_model()
+
+
+@override_settings(LOW_STOCK_ALERTS_ASYNC=False)
+class ChangesTests(TestCase):
+    url = '/api/sync/changes/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.item = InventoryItem.objects.create(name='Beer', cost=Decimal('2.50'), quantity=10)
+        self.customer = Customer.objects.create(name='Bob', phone_number='08030000000', tab_limit=Decimal('100.00'))
+        self.version = self.changes()['version']
+
+    def changes(self, since=0, **params):
+        response = self.client.get(self.url, {'since': since, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def names(self, section):
+        return sorted(row.get('name') or row.get('customer_name') for row in section['updated'])
+
+    def test_returns_only_rows_changed_since_the_version(self):
+        self.client.post('/api/sales/', {'item': self.item.pk, 'quantity': 2, 'customer': self.customer.pk}, format='json')
+        Customer.objects.create(name='Alice', phone_number='08031111111')
+        data = self.changes(self.version)
+        self.assertEqual(self.names(data['changes']['inventory_items']), ['Beer'])
+        self.assertEqual(data['changes']['inventory_items']['updated'][0]['quantity'], 8)
+        self.assertEqual(self.names(data['changes']['customers']), ['Alice'])
+        self.assertEqual(self.names(data['changes']['tabs']), ['Bob'])
+        self.assertEqual(self.changes(data['version'])['changes']['customers'], {'updated': [], 'deleted': []})
+
+    def test_soft_and_hard_deletes_come_back_as_tombstones(self):
+        self.item.soft_delete()
+        customer_id = self.customer.pk
+        self.customer.delete()
+        data = self.changes(self.version)['changes']
+        self.assertEqual(data['inventory_items'], {'updated': [], 'deleted': [self.item.pk]})
+        self.assertEqual(data['customers'], {'updated': [], 'deleted': [customer_id]})
+
+    def test_pages_with_limit(self):
+        for i in range(3):
+            Customer.objects.create(name=f'Customer {i}', phone_number=f'0803222222{i}')
+        first = self.changes(self.version, limit=2)
+        self.assertTrue(first['has_more'])
+        rest = self.changes(first['version'], limit=2)
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(
+            self.names(first['changes']['customers']) + self.names(rest['changes']['customers']),
+            ['Customer 0', 'Customer 1', 'Customer 2'],
+        )
+
+    def test_other_users_flags_are_only_visible_to_user_managers(self):
+        clerk = User.objects.create_user('clerk', 'clerk@example.com', 'password')
+        self.client.force_authenticate(clerk)
+        users = self.changes()['changes']['users']
+        self.assertEqual([row['id'] for row in users['updated']], [clerk.pk])
+
+    def test_rejects_a_non_numeric_version(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'yesterday'}).status_code, 400)
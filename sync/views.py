@@ -0,0 +1,97 @@
+import logging
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.contrib.auth import get_user_model
+from customers.models import Customer, CustomerTab
+from customers.serializers import CustomerSerializer, CustomerTabSerializer
+from inventory.models import InventoryItem
+from inventory.serializers import InventoryItemSerializer
+from .changes import label
+from .models import Change
+from .serializers import UserPermissionsSerializer
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+class ChangesView(APIView):
+    permission_classes = [IsAuthenticated]
+    default_limit = 500
+    max_limit = 5000
+
+    # Response key, model, queryset, serializer
+    sections = [
+        ('inventory_items', InventoryItem, InventoryItem.objects.all(), InventoryItemSerializer),
+        ('customers', Customer, Customer.objects.all(), CustomerSerializer),
+        ('tabs', CustomerTab, CustomerTab.objects.select_related('customer'), CustomerTabSerializer),
+        ('users', User, User.objects.all(), UserPermissionsSerializer),
+    ]
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def is_tombstone(self, model, obj):
+        if obj is None:
+            return True
+        if model is InventoryItem:
+            return obj.is_deleted
+        return False
+
+    def visible(self, model, pks, request):
+        # Only user managers see other users' permission flags
+        if model is User and not request.user.has_user_management_permission():
+            return [pk for pk in pks if pk == request.user.pk]
+        return pks
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            return Response({"error": "since must be an integer version"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = self.get_limit(request)
+
+        try:
+            rows = list(
+                Change.objects.filter(version__gt=since).order_by('version')
+                .values_list('version', 'model', 'object_id')[:limit + 1]
+            )
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            changed = {}
+            for version, model, object_id in rows:
+                changed.setdefault(model, []).append(object_id)
+
+            changes = {}
+            for key, model, queryset, serializer_class in self.sections:
+                pks = self.visible(model, changed.get(label(model), []), request)
+                objects = queryset.in_bulk(pks) if pks else {}
+                updated = []
+                deleted = []
+                for pk in pks:
+                    obj = objects.get(pk)
+                    if self.is_tombstone(model, obj):
+                        deleted.append(pk)
+                    else:
+                        updated.append(obj)
+                changes[key] = {
+                    'updated': serializer_class(updated, many=True).data,
+                    'deleted': deleted,
+                }
+
+            version = rows[-1][0] if rows else since
+            logger.info(f"Sync for {request.user} since {since}: {len(rows)} changes up to version {version}")
+            return Response({
+                'version': version,
+                'has_more': has_more,
+                'changes': changes,
+            })
+        except Exception as e:
+            logger.error(f"Error in sync changes for user {request.user}: {str(e)}", exc_info=True)
+            return Response({"error": "An unexpected error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from rest_framework.authtoken.models import Token
+        from barMan_backend.cache_versions import track_changes
+        from barMan_backend import sessions  # noqa: F401, registers the session cache check
+        from . import authentication
+        CustomUser = self.get_model('CustomUser')
+        track_changes(CustomUser)
+        # Cached token lookups carry the user, so any change to either drops them
+        post_save.connect(authentication.user_changed, sender=CustomUser, dispatch_uid='auth-cache-user-save')
+        post_delete.connect(authentication.user_changed, sender=CustomUser, dispatch_uid='auth-cache-user-delete')
+        post_save.connect(authentication.token_changed, sender=Token, dispatch_uid='auth-cache-token-save')
+        post_delete.connect(authentication.token_changed, sender=Token, dispatch_uid='auth-cache-token-delete')
@@ -0,0 +1,169 @@
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from . import permissions
+
+logger = logging.getLogger(__name__)
+
+# Token lookups are cached in two layers: a small per-process LRU, checked
+# first, and the shared cache behind it. The shared layer is skipped when the
+# default cache is a per-process LocMemCache, which could not carry an
+# invalidation to the other workers. Saving or deleting a user or their token
+# clears both layers here and the shared cache everywhere; other processes'
+# LRUs catch up within TOKEN_CACHE_LOCAL_TTL. Writes that skip model signals
+# (queryset.update) must call invalidate() themselves, or they are only seen
+# once the entries expire.
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _shared_cache():
+    shared = caches['default']
+    return None if isinstance(shared, LocMemCache) else shared
+
+
+def _key(token_key):
+    # Raw tokens never appear in cache keys
+    return 'auth-token:' + hashlib.sha256(token_key.encode()).hexdigest()
+
+
+class _LocalCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        ttl = _setting('TOKEN_CACHE_LOCAL_TTL', 10)
+        size = _setting('TOKEN_CACHE_LOCAL_SIZE', 1024)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def discard(self, keys, user_id=None):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            if user_id is not None:
+                for key in [key for key, (_, (user, *_)) in self._entries.items() if user.pk == user_id]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = _LocalCache()
+
+
+def expires_at(token):
+    lifetime = _setting('TOKEN_TTL', None)
+    if lifetime is None:
+        return None
+    return token.created + timedelta(seconds=lifetime)
+
+
+def is_expired(token):
+    expiry = expires_at(token)
+    return expiry is not None and expiry <= timezone.now()
+
+
+def rotate(user):
+    """Replace user's token with a fresh one and return it."""
+    with transaction.atomic():
+        Token.objects.filter(user=user).delete()
+        return Token.objects.create(user=user)
+
+
+def token_for_login(user):
+    # Logging in keeps a live token and replaces an expired one
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and is_expired(token):
+        token = rotate(user)
+    return token
+
+
+def invalidate(token_keys, user_id=None):
+    keys = [_key(token_key) for token_key in token_keys]
+    _local.discard(keys, user_id)
+    shared = _shared_cache()
+    if keys and shared is not None:
+        shared.delete_many(keys)
+
+
+def _invalidate_on_commit(token_keys, user_id=None):
+    # Clearing before commit would let a concurrent request cache the old row again
+    transaction.on_commit(lambda: invalidate(token_keys, user_id))
+
+
+def user_changed(sender, instance, **kwargs):
+    # Permission flags, is_active and the password all ride on the cached user
+    token_keys = list(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+    _invalidate_on_commit(token_keys, instance.pk)
+
+
+def token_changed(sender, instance, **kwargs):
+    _invalidate_on_commit([instance.key], instance.user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication with cached lookups and optional expiry (TOKEN_TTL)."""
+
+    def authenticate_credentials(self, key):
+        cache_key = _key(key)
+        entry = _local.get(cache_key)
+        if entry is None:
+            shared = _shared_cache()
+            entry = shared.get(cache_key) if shared is not None else None
+            if entry is None:
+                entry = self._load(key)
+                if shared is not None:
+                    shared.set(cache_key, entry, _setting('TOKEN_CACHE_TTL', 300))
+            _local.set(cache_key, entry)
+
+        user, token, perms = entry
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if is_expired(token):
+            logger.info(f"Rejected expired token for user: {user.username}")
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        # Each request gets its own copy; the cached instance is shared
+        user = copy.copy(user)
+        user._permission_snapshot = perms
+        return user, token
+
+    def _load(self, key):
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            # Unknown keys are not cached, so a new token works straight away
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        # The permission snapshot is cached with the token, so permission
+        # checks on a warm request read neither the database nor the user
+        return token.user, token, permissions.snapshot(token.user)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from barMan_backend.sessions import purge_expired
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Sessions deleted per statement')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sessions'))
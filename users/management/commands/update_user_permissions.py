@@ -24,10 +24,18 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'User "{username}" does not exist'))
             return
 
-        permissions = ['inventory', 'sales', 'customers', 'create_tabs', 'update_tabs', 'manage_users']
-        for perm in permissions:
-            if options[perm] is not None:
-                setattr(user, f'can_{perm}', options[perm].lower() == 'true')
+        # Option name -> CustomUser flag
+        permissions = {
+            'inventory': 'can_update_inventory',
+            'sales': 'can_report_sales',
+            'customers': 'can_create_customers',
+            'create_tabs': 'can_create_tabs',
+            'update_tabs': 'can_update_tabs',
+            'manage_users': 'can_manage_users',
+        }
+        for option, field in permissions.items():
+            if options[option] is not None:
+                setattr(user, field, options[option].lower() == 'true')
 
         user.save()
 
@@ -0,0 +1,47 @@
+import logging
+from barMan_backend.log_filters import DebugSampler
+
+logger = logging.getLogger(__name__)
+log_sample = DebugSampler(logger)
+
+# CustomUser flags the permission classes check
+FLAGS = (
+    'can_update_inventory',
+    'can_report_sales',
+    'can_create_customers',
+    'can_create_tabs',
+    'can_update_tabs',
+    'can_manage_users',
+)
+
+
+def snapshot(user):
+    """Everything the permission classes look at, read from user once."""
+    if user is None or not user.is_authenticated:
+        return {'is_authenticated': False}
+    perms = {
+        'is_authenticated': True,
+        'is_superuser': user.is_superuser,
+        'is_staff': user.is_staff,
+    }
+    for flag in FLAGS:
+        perms[flag] = getattr(user, flag, False)
+    return perms
+
+
+def for_request(request):
+    # Token users arrive with the snapshot cached alongside their token;
+    # anyone else gets one built on first use and kept for the request
+    perms = getattr(request, '_permission_snapshot', None)
+    if perms is None:
+        perms = getattr(request.user, '_permission_snapshot', None) or snapshot(request.user)
+        request._permission_snapshot = perms
+    return perms
+
+
+def has(request, name):
+    perms = for_request(request)
+    allowed = perms['is_authenticated'] and perms.get(name, False)
+    if log_sample():
+        logger.debug(f"Permission {name} for {request.user}: {allowed}")
+    return allowed
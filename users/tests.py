@@ -1,3 +1,203 @@
-from django.test import TestCase
+from datetime import timedelta
+import logging
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from barMan_backend.log_filters import DebugSampler
+from barMan_backend.query_budget import QueryBudgetMixin
+from barMan_backend import sessions
+from . import authentication, permissions
 
-# Create your tests here.
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+SHARED = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/barman-test'}}
+
+
+class SessionCacheCheckTests(SimpleTestCase):
+    @override_settings(SESSION_ENGINE='barMan_backend.sessions', CACHES=LOCMEM)
+    def test_cache_engine_refuses_a_per_process_cache(self):
+        errors = sessions.check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['barMan_backend.E001'])
+
+    @override_settings(SESSION_ENGINE='barMan_backend.sessions', CACHES=SHARED)
+    def test_cache_engine_accepts_a_shared_cache(self):
+        self.assertEqual(sessions.check_shared_cache(None), [])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db', CACHES=LOCMEM)
+    def test_database_engine_is_not_checked(self):
+        self.assertEqual(sessions.check_shared_cache(None), [])
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_users(self):
+        User.objects.bulk_create([User(username=f'clerk{i}', email=f'clerk{i}@example.com') for i in range(20)])
+
+    def test_user_list(self):
+        self.assertQueryCountFlat(self.client, '/api/users/', grow=self.add_users)
+
+
+class TokenTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._local.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.clerk = User.objects.create_user('clerk', 'clerk@example.com', 'password', can_create_customers=True)
+        self.token = Token.objects.create(user=self.clerk)
+
+    def get(self, key, url='/api/users/me/'):
+        return APIClient().get(url, HTTP_AUTHORIZATION=f'Token {key}')
+
+    def create_customer(self, key, name='Bob'):
+        return APIClient().post(
+            '/api/customers/', {'name': name, 'phone_number': '08030000000'}, format='json',
+            HTTP_AUTHORIZATION=f'Token {key}',
+        )
+
+    def expire(self, token):
+        Token.objects.filter(pk=token.pk).update(created=timezone.now() - timedelta(days=31))
+        authentication.invalidate([token.key])
+
+
+class TokenAuthenticationTests(TokenTestCase):
+    def test_expired_token_is_refused(self):
+        self.assertEqual(self.get(self.token.key).status_code, 200)
+        self.expire(self.token)
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+
+    def test_login_replaces_an_expired_token(self):
+        self.expire(self.token)
+        response = APIClient().post('/api/token-auth/', {'username': 'clerk', 'password': 'password'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertNotEqual(response.data['token'], self.token.key)
+        self.assertEqual(self.get(response.data['token']).status_code, 200)
+
+    def test_login_keeps_a_live_token(self):
+        response = APIClient().post('/api/token-auth/', {'username': 'clerk', 'password': 'password'}, format='json')
+        self.assertEqual(response.data['token'], self.token.key)
+
+    def test_rotation_revokes_the_old_key(self):
+        self.assertEqual(self.get(self.token.key).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post('/api/token-rotate/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+        self.assertEqual(self.get(response.data['token']).status_code, 200)
+
+    def test_update_permissions_drops_the_cached_entry(self):
+        self.assertEqual(self.create_customer(self.token.key).status_code, 201)
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(
+                f'/api/users/{self.clerk.pk}/update_permissions/', {'can_create_customers': False}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.create_customer(self.token.key, 'Ann').status_code, 403)
+
+    def test_update_user_permissions_command_drops_the_cached_entry(self):
+        self.assertEqual(self.create_customer(self.token.key).status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('update_user_permissions', 'clerk', '--customers', 'false', stdout=StringIO())
+        self.assertEqual(self.create_customer(self.token.key, 'Ann').status_code, 403)
+
+    def test_deactivated_user_is_refused(self):
+        self.assertEqual(self.get(self.token.key).status_code, 200)
+        self.clerk.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clerk.save()
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+
+    def test_per_process_cache_is_not_used_as_the_shared_layer(self):
+        self.get(self.token.key)
+        self.assertIsNone(authentication._shared_cache())
+        self.assertIsNone(cache.get(authentication._key(self.token.key)))
+
+    @override_settings(CACHES=SHARED)
+    def test_shared_cache_holds_the_lookup(self):
+        cache.clear()
+        cache_key = authentication._key(self.token.key)
+        self.get(self.token.key)
+        self.assertIsNotNone(cache.get(cache_key))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertIsNone(cache.get(cache_key))
+        cache.clear()
+
+
+class PermissionSnapshotTests(TokenTestCase):
+    def token_request(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return Request(request, authenticators=[authentication.CachedTokenAuthentication()])
+
+    def test_token_path_uses_the_cached_snapshot(self):
+        permissions.has(self.token_request(), 'can_create_customers')
+        request = self.token_request()
+        with self.assertNumQueries(0):
+            self.assertTrue(permissions.has(request, 'can_create_customers'))
+            self.assertFalse(permissions.has(request, 'can_manage_users'))
+
+    def test_revoked_flag_applies_on_the_next_request(self):
+        self.assertTrue(permissions.has(self.token_request(), 'can_create_customers'))
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.patch(f'/api/users/{self.clerk.pk}/update_permissions/', {'can_create_customers': False}, format='json')
+        self.assertFalse(permissions.has(self.token_request(), 'can_create_customers'))
+
+    def test_session_path_builds_the_snapshot_once_per_request(self):
+        def session_request():
+            # As SessionAuthentication leaves it: a plain user, no cached snapshot
+            request = Request(APIRequestFactory().get('/'), authenticators=[])
+            request.user = User.objects.get(pk=self.clerk.pk)
+            return request
+
+        with mock.patch.object(permissions, 'snapshot', wraps=permissions.snapshot) as snapshot:
+            request = session_request()
+            for name in ('can_create_customers', 'can_update_tabs', 'can_create_customers'):
+                permissions.has(request, name)
+            self.assertEqual(snapshot.call_count, 1)
+            permissions.has(session_request(), 'can_create_customers')
+            self.assertEqual(snapshot.call_count, 2)
+
+    def test_anonymous_requests_have_no_permissions(self):
+        request = Request(APIRequestFactory().get('/'), authenticators=[])
+        self.assertFalse(permissions.has(request, 'can_create_customers'))
+
+
+class DebugSamplerTests(SimpleTestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('barman.tests.sampler')
+        self.addCleanup(self.logger.setLevel, self.logger.level)
+
+    def test_silent_unless_debug_is_enabled(self):
+        self.logger.setLevel(logging.INFO)
+        sample = DebugSampler(self.logger, rate=1)
+        self.assertFalse(any(sample() for _ in range(100)))
+
+    def test_samples_at_the_rate_when_debug_is_enabled(self):
+        self.logger.setLevel(logging.DEBUG)
+        self.assertTrue(DebugSampler(self.logger, rate=1)())
+        self.assertFalse(DebugSampler(self.logger, rate=0)())
+
+    def test_permission_checks_log_nothing_when_debug_is_off(self):
+        user = User(username='clerk', can_create_customers=True)
+        request = Request(APIRequestFactory().get('/'), authenticators=[])
+        request.user = user
+        with mock.patch.object(permissions.logger, 'isEnabledFor', return_value=False), \
+                mock.patch.object(permissions.logger, 'debug') as debug:
+            for _ in range(200):
+                permissions.has(request, 'can_create_customers')
+        debug.assert_not_called()
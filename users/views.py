@@ -2,18 +2,19 @@ import logging
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.authtoken.views import ObtainAuthToken
-from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
 from .serializers import UserSerializer, UserCreateSerializer
+from . import authentication
+from barMan_backend.etags import VersionedETagMixin
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(VersionedETagMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
@@ -88,11 +89,11 @@ class CustomAuthToken(ObtainAuthToken):
         try:
             if serializer.is_valid():
                 user = serializer.validated_data['user']
-                token, created = Token.objects.get_or_create(user=user)
+                token = authentication.token_for_login(user)
                 logger.info(f"Authentication successful for user: {user.username}")
-                logger.info(f"Token created: {created}")
                 response_data = {
                     'token': token.key,
+                    'expires_at': authentication.expires_at(token),
                     'user_id': user.pk,
                     'email': user.email,
                     'username': user.username,
@@ -110,3 +111,13 @@ class CustomAuthToken(ObtainAuthToken):
         except Exception as e:
             logger.exception(f"Unexpected error during authentication: {str(e)}")
             return Response({"error": "An unexpected error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RotateTokenView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # The old token stops working as soon as this commits
+        token = authentication.rotate(request.user)
+        logger.info(f"Token rotated for user: {request.user.username}")
+        return Response({'token': token.key, 'expires_at': authentication.expires_at(token)})